@@ -8,6 +8,10 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 from channels.auth import AuthMiddlewareStack
 import stream.routing
+from stream.services.detector import detector_registry
+
+# Load and warm the default face model once, before the first WebSocket connects
+detector_registry.preload()
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
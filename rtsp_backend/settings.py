@@ -91,9 +91,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Seconds a connection waits for the write lock before "database is locked"
+            'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+            # Take the write lock when a transaction starts, so the busy timeout applies
+            # instead of failing immediately when a reader tries to upgrade mid-transaction
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Seconds to keep connections open between requests (0 = close after each, safest under ASGI)
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# WAL journal: readers (API, exports) no longer block the detection writer and vice versa
+SQLITE_WAL = config('SQLITE_WAL', default=True, cast=bool)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -140,6 +153,99 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Face detector backend for streams that don't pick one, and where the ONNX/Caffe model files live
+DEFAULT_DETECTOR_BACKEND = config('DEFAULT_DETECTOR_BACKEND', default='mtcnn')
+FACE_MODELS_DIR = config('FACE_MODELS_DIR', default=os.path.join(BASE_DIR, 'models'))
+
+# Face detection worker processes (0 runs inference inside the server process)
+DETECTION_WORKERS = config('DETECTION_WORKERS', default=os.cpu_count() or 1, cast=int)
+# Largest frame a worker can receive through shared memory (bytes of bgr24)
+DETECTION_MAX_FRAME_BYTES = config('DETECTION_MAX_FRAME_BYTES', default=1280 * 720 * 3, cast=int)
+# Cross-stream batching: flush after this many frames or this many ms, whichever comes first
+DETECTION_BATCH_SIZE = config('DETECTION_BATCH_SIZE', default=8, cast=int)
+DETECTION_BATCH_WAIT_MS = config('DETECTION_BATCH_WAIT_MS', default=15, cast=int)
+
+# When True, streams with detection_enabled are processed by `manage.py run_detectors`
+# and WebSocket viewers of a stream_id only follow its published frames and alerts
+DETECTION_SUPERVISOR = config('DETECTION_SUPERVISOR', default='False') == 'True'
+# Multi-node: each camera is owned by the one supervisor holding its lease in Redis.
+# A lease not renewed within the TTL (node died or hung) is picked up by another node.
+DETECTION_NODE_ID = config('DETECTION_NODE_ID', default='')
+DETECTION_LEASE_TTL = config('DETECTION_LEASE_TTL', default=15, cast=int)
+# Width of frames the owner publishes to viewers (0 keeps the stream's preview size)
+DETECTION_PUBLISH_WIDTH = config('DETECTION_PUBLISH_WIDTH', default=0, cast=int)
+
+# Detections/alerts are persisted in the background: bulk inserts every DETECTION_PERSIST_INTERVAL_MS
+# or DETECTION_PERSIST_BATCH events; beyond DETECTION_PERSIST_QUEUE pending events the oldest are dropped
+DETECTION_PERSIST_INTERVAL_MS = config('DETECTION_PERSIST_INTERVAL_MS', default=500, cast=int)
+DETECTION_PERSIST_BATCH = config('DETECTION_PERSIST_BATCH', default=64, cast=int)
+DETECTION_PERSIST_QUEUE = config('DETECTION_PERSIST_QUEUE', default=256, cast=int)
+
+# Retention defaults for streams that don't set their own (0 = no limit)
+RETENTION_DAYS = config('RETENTION_DAYS', default=30, cast=int)
+RETENTION_MAX_DETECTIONS = config('RETENTION_MAX_DETECTIONS', default=0, cast=int)
+RETENTION_MAX_MB = config('RETENTION_MAX_MB', default=0, cast=int)
+
+# Supervised ffmpeg ingest: reconnect with exponential backoff (plus jitter) up to INGEST_BACKOFF_MAX seconds,
+# restart when no frame arrives for INGEST_STALL_TIMEOUT (INGEST_CONNECT_TIMEOUT before the first frame)
+INGEST_BACKOFF_BASE = config('INGEST_BACKOFF_BASE', default=1.0, cast=float)
+INGEST_BACKOFF_MAX = config('INGEST_BACKOFF_MAX', default=30.0, cast=float)
+INGEST_STALL_TIMEOUT = config('INGEST_STALL_TIMEOUT', default=10.0, cast=float)
+INGEST_CONNECT_TIMEOUT = config('INGEST_CONNECT_TIMEOUT', default=30.0, cast=float)
+# ffmpeg's own log level; its stderr is counted per kind and logged through the stream's logger
+INGEST_FFMPEG_LOGLEVEL = config('INGEST_FFMPEG_LOGLEVEL', default='warning')
+# Stream.status / last_connected are written in batches at most this often (seconds)
+STREAM_STATUS_FLUSH_INTERVAL = config('STREAM_STATUS_FLUSH_INTERVAL', default=2.0, cast=float)
+
+# Most jobs the single database writer thread commits in one transaction
+DB_WRITER_BATCH = config('DB_WRITER_BATCH', default=32, cast=int)
+
+# Port `manage.py run_detectors` serves Prometheus metrics on (0 = off; the web server has /metrics)
+DETECTION_METRICS_PORT = config('DETECTION_METRICS_PORT', default=0, cast=int)
+
+# Seconds the stream list is served from memory before re-reading the database
+# (stream views refresh it immediately; this only catches admin edits and other processes)
+STREAM_CATALOGUE_MAX_AGE = config('STREAM_CATALOGUE_MAX_AGE', default=30, cast=float)
+
+# Pipeline logging: records are queued and written by a background thread (LOG_QUEUE_SIZE, dropped when full);
+# each logger + message repeats at most LOG_RATE_LIMIT_BURST times per LOG_RATE_LIMIT_INTERVAL seconds (0 = no limit)
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_QUEUE_SIZE = config('LOG_QUEUE_SIZE', default=10000, cast=int)
+LOG_RATE_LIMIT_BURST = config('LOG_RATE_LIMIT_BURST', default=5, cast=int)
+LOG_RATE_LIMIT_INTERVAL = config('LOG_RATE_LIMIT_INTERVAL', default=10.0, cast=float)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'pipeline': {
+            '()': 'stream.services.logs.StreamFormatter',
+            'format': '%(asctime)s %(levelname)s [%(stream)s] %(message)s',
+        },
+    },
+    'filters': {
+        'rate_limit': {
+            '()': 'stream.services.logs.RateLimitFilter',
+            'burst': LOG_RATE_LIMIT_BURST,
+            'interval': LOG_RATE_LIMIT_INTERVAL,
+        },
+    },
+    'handlers': {
+        'pipeline': {
+            '()': 'stream.services.logs.AsyncLogHandler',
+            'max_queue': LOG_QUEUE_SIZE,
+            'formatter': 'pipeline',
+            'filters': ['rate_limit'],
+        },
+    },
+    'loggers': {
+        # Per-stream levels are set at runtime on stream.pipeline.<stream id>
+        'stream': {'handlers': ['pipeline'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
+REDIS_URL = redis_url
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class StreamConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stream'
+
+    def ready(self):
+        from stream.services.database import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='stream_configure_sqlite')
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import JsonResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from stream.models import Stream
+from stream.services.catalogue import serialize_stream, stream_catalogue
+from stream.views.stream import list_streams
+
+BENCH_STREAM_PREFIX = '__bench_catalogue__'
+
+
+def legacy_list_streams():
+    # What list_streams used to do on every poll: every row, serialized from scratch
+    return JsonResponse({'streams': [serialize_stream(stream) for stream in Stream.objects.all()]})
+
+
+class Command(BaseCommand):
+    help = "Seed streams and compare the old stream listing with the cached catalogue and 304 polls"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=200)
+        parser.add_argument('--polls', type=int, default=500, help="Requests timed per case")
+
+    def handle(self, *args, **options):
+        Stream.objects.bulk_create([
+            Stream(name=f'{BENCH_STREAM_PREFIX}{i}', rtsp_url=f'rtsp://bench.invalid/{i}', detection_enabled=False)
+            for i in range(options['streams'])
+        ])
+        stream_catalogue.invalidate()
+        try:
+            self.run(options['polls'])
+        finally:
+            Stream.objects.filter(name__startswith=BENCH_STREAM_PREFIX).delete()
+            stream_catalogue.invalidate()
+
+    def run(self, polls):
+        factory = RequestFactory()
+        etag = list_streams(factory.get('/'))['ETag']
+
+        cases = [
+            ('legacy: full rebuild', legacy_list_streams),
+            ('catalogue: 200 OK', lambda: list_streams(factory.get('/'))),
+            ('catalogue: 304 Not Modified', lambda: list_streams(factory.get('/', HTTP_IF_NONE_MATCH=etag))),
+        ]
+        self.stdout.write(f"\n{Stream.objects.count()} streams, {polls} polls per case")
+        self.stdout.write(f"{'case':<30} {'ms/poll':>9} {'queries':>8} {'bytes':>9}")
+        for name, func in cases:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(polls):
+                    result = func()
+                elapsed = time.perf_counter() - start
+            size = len(result.content)
+            self.stdout.write(f"{name:<30} {elapsed / polls * 1000:>9.3f} {len(queries) / polls:>8.2f} {size:>9}")
+        self.stdout.write(f"\ncatalogue: {stream_catalogue.get_stats()}")
@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+import cv2
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from stream.services.backends import BACKENDS, create_backend
+from stream.services.tracking import iou
+
+
+def count_matches(ground_truth, detections, threshold):
+    # Greedy one-to-one matching of detections to annotated faces
+    unmatched = list(detections)
+    matched = 0
+    for box in ground_truth:
+        best = max(unmatched, key=lambda d: iou(box, d[:4]), default=None)
+        if best is not None and iou(box, best[:4]) >= threshold:
+            unmatched.remove(best)
+            matched += 1
+    return matched
+
+
+class Command(BaseCommand):
+    help = "Benchmark face detector backends (ms/frame and recall) on an annotated fixture image set"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', help="Directory of images plus annotations.json mapping file name -> [[x, y, w, h], ...]")
+        parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS))
+        parser.add_argument('--repeat', type=int, default=3, help="Timed passes over the image set")
+        parser.add_argument('--min-confidence', type=float, default=0.5)
+        parser.add_argument('--iou', type=float, default=0.5, help="IoU needed for a detection to count as a hit")
+
+    def handle(self, *args, **options):
+        fixtures = options['fixtures']
+        annotations_path = os.path.join(fixtures, 'annotations.json')
+        if not os.path.exists(annotations_path):
+            raise CommandError(f"Missing {annotations_path}")
+        with open(annotations_path) as f:
+            annotations = json.load(f)
+
+        images = []
+        for filename, boxes in annotations.items():
+            frame = cv2.imread(os.path.join(fixtures, filename))
+            if frame is None:
+                self.stderr.write(f"⚠️ Skipping unreadable image {filename}")
+                continue
+            images.append((frame, boxes))
+        if not images:
+            raise CommandError("No readable fixture images")
+
+        total_faces = sum(len(boxes) for _, boxes in images)
+        self.stdout.write(f"📂 {len(images)} images, {total_faces} annotated faces\n")
+        self.stdout.write(f"{'backend':<8} {'load ms':>9} {'ms/frame':>9} {'recall':>7} {'false+':>7}")
+
+        for name in options['backends']:
+            try:
+                load_start = time.perf_counter()
+                backend = create_backend(name, settings.FACE_MODELS_DIR)
+                backend.detect(images[0][0])  # warm-up
+                load_time = time.perf_counter() - load_start
+            except Exception as e:
+                self.stdout.write(f"{name:<8} skipped: {e}")
+                continue
+
+            elapsed = 0
+            matched = 0
+            false_positives = 0
+            for run in range(options['repeat']):
+                for frame, boxes in images:
+                    start = time.perf_counter()
+                    faces = backend.detect(frame)
+                    elapsed += time.perf_counter() - start
+                    if run == 0:
+                        faces = [face for face in faces if face[4] >= options['min_confidence']]
+                        hits = count_matches(boxes, faces, options['iou'])
+                        matched += hits
+                        false_positives += len(faces) - hits
+
+            ms_per_frame = elapsed * 1000 / (len(images) * options['repeat'])
+            recall = matched / total_faces if total_faces else 0
+            self.stdout.write(
+                f"{name:<8} {load_time * 1000:>9.1f} {ms_per_frame:>9.2f} {recall:>7.3f} {false_positives:>7}"
+            )
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from stream.services.frame_reader import FrameReader
+
+
+def start_writer(frames, frame_size):
+    # Feeds a pipe with raw bgr24 frames, like ffmpeg's stdout
+    read_fd, write_fd = os.pipe()
+    payload = bytes(frame_size)
+
+    def write():
+        with os.fdopen(write_fd, 'wb') as pipe:
+            for _ in range(frames):
+                pipe.write(payload)
+
+    threading.Thread(target=write, daemon=True).start()
+    return os.fdopen(read_fd, 'rb')
+
+
+class Command(BaseCommand):
+    help = "Compare per-frame allocations and read latency of the old to_thread read path and FrameReader"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--frames', type=int, default=300)
+        parser.add_argument('--width', type=int, default=640)
+        parser.add_argument('--height', type=int, default=480)
+
+    def handle(self, *args, **options):
+        frames = options['frames']
+        width, height = options['width'], options['height']
+        frame_size = width * height * 3
+
+        results = {
+            'to_thread read': asyncio.run(self.bench_to_thread(frames, width, height, frame_size)),
+            'FrameReader': asyncio.run(self.bench_frame_reader(frames, width, height, frame_size)),
+        }
+
+        self.stdout.write(f"{frames} frames of {width}x{height} bgr24 ({frame_size} bytes)\n")
+        self.stdout.write(f"{'path':<16} {'alloc B/frame':>14} {'peak alloc B':>13} {'read ms/frame':>14}")
+        for name, (alloc_per_frame, peak, ms_per_frame) in results.items():
+            self.stdout.write(f"{name:<16} {alloc_per_frame:>14.0f} {peak:>13} {ms_per_frame:>14.3f}")
+
+    async def bench_to_thread(self, frames, width, height, frame_size):
+        pipe = start_writer(frames, frame_size)
+        allocated = 0
+        peak = 0
+        elapsed = 0
+        # Hold the previous frame through each measured window so its release (whenever the
+        # executor drops its own reference) can't hide the next frame's allocation
+        previous = None
+        tracemalloc.start()
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            raw_frame = await asyncio.to_thread(pipe.read, frame_size)
+            frame = np.frombuffer(raw_frame, np.uint8).reshape((height, width, 3))
+            elapsed += time.perf_counter() - start
+            frame_peak = tracemalloc.get_traced_memory()[1] - base
+            allocated += frame_peak
+            peak = max(peak, frame_peak)
+            previous = frame
+            del frame, raw_frame
+        del previous
+        tracemalloc.stop()
+        pipe.close()
+        return allocated / frames, peak, elapsed * 1000 / frames
+
+    async def bench_frame_reader(self, frames, width, height, frame_size):
+        pipe = start_writer(frames, frame_size)
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        finished = asyncio.Event()
+        reader = FrameReader(pipe, width, height, loop, on_frame=lambda frame, read_time: queue.put_nowait(frame), on_eof=finished.set)
+
+        allocated = 0
+        peak = 0
+        elapsed = 0
+        previous = None
+        tracemalloc.start()
+        reader.start()
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            frame = await queue.get()
+            elapsed += time.perf_counter() - start
+            frame_peak = tracemalloc.get_traced_memory()[1] - base
+            allocated += frame_peak
+            peak = max(peak, frame_peak)
+            previous = frame
+            del frame
+        del previous
+        tracemalloc.stop()
+        await finished.wait()
+        pipe.close()
+        return allocated / frames, peak, elapsed * 1000 / frames
@@ -0,0 +1,139 @@
+import json
+import random
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from stream.models import Alert, Detection, Stream
+from stream.views.alert import list_alerts
+from stream.views.detection import list_detections
+
+BENCH_STREAM_NAME = '__bench_listing__'
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed * 1000, peak / (1024 * 1024)
+
+
+def legacy_list_alerts():
+    # What list_alerts used to do: every row, one response
+    alerts = Alert.objects.select_related("detection", "detection__stream").all().order_by('-timestamp')
+    return [{
+        "id": alert.id,
+        "detection_id": alert.detection.id,
+        "stream_id": alert.detection.stream.id,
+        "confidence_score": alert.detection.confidence_score,
+        "image_url": alert.detection.image_path.url if alert.detection.image_path else None,
+        "timestamp": alert.timestamp,
+        "viewed": alert.viewed,
+    } for alert in alerts]
+
+
+class Command(BaseCommand):
+    help = "Seed detections/alerts and compare the old full listing with cursor-paginated pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=90, help="Spread seeded rows over this many days")
+        parser.add_argument('--skip-legacy', action='store_true', help="Don't time the old unpaginated listing")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded stream and rows afterwards")
+
+    def handle(self, *args, **options):
+        stream = Stream.objects.filter(name=BENCH_STREAM_NAME).first()
+        if stream is None or Detection.objects.filter(stream=stream).count() != options['rows']:
+            if stream:
+                self.remove(stream)
+            stream = Stream.objects.create(name=BENCH_STREAM_NAME, rtsp_url='rtsp://bench.invalid/stream', detection_enabled=False)
+            self.seed(stream, options['rows'], options['days'])
+
+        try:
+            self.run(stream, options)
+        finally:
+            if not options['keep']:
+                self.remove(stream)
+
+    def remove(self, stream):
+        # Plain SQL: Model.delete() would load every seeded row to cascade
+        self.stdout.write("🧹 Removing seeded rows")
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {Alert._meta.db_table} WHERE detection_id IN "
+                f"(SELECT id FROM {Detection._meta.db_table} WHERE stream_id = %s)", [stream.id]
+            )
+            cursor.execute(f"DELETE FROM {Detection._meta.db_table} WHERE stream_id = %s", [stream.id])
+        stream.delete()
+
+    def seed(self, stream, rows, days):
+        self.stdout.write(f"🌱 Seeding {rows} detections with alerts over {days} days")
+        start = time.perf_counter()
+        now_time = timezone.now()
+        span = days * 86400
+        # Backdated timestamps: the fields only default to now, so explicit values are kept
+        for offset in range(0, rows, 10_000):
+            count = min(10_000, rows - offset)
+            with transaction.atomic():
+                detections = Detection.objects.bulk_create([
+                    Detection(
+                        stream=stream,
+                        confidence_score=random.uniform(0.3, 1.0),
+                        image_path=f'detections/bench_{offset + i}.jpg',
+                        timestamp=now_time - timedelta(seconds=random.uniform(0, span)),
+                    )
+                    for i in range(count)
+                ])
+                Alert.objects.bulk_create([
+                    Alert(detection=d, timestamp=d.timestamp, viewed=random.random() < 0.7)
+                    for d in detections
+                ])
+        self.stdout.write(f"   seeded in {time.perf_counter() - start:.1f}s")
+
+    def run(self, stream, options):
+        factory = RequestFactory()
+        rows = options['rows']
+        week_ago = (timezone.now() - timedelta(days=7)).isoformat()
+
+        def page(view, **params):
+            return lambda: view(factory.get('/', params))
+
+        def walk(view, pages, **params):
+            # Follow next_cursor for several pages to show deep pages cost the same as the first
+            def run():
+                cursor = None
+                for _ in range(pages):
+                    query = dict(params, **({'cursor': cursor} if cursor else {}))
+                    response = view(factory.get('/', query))
+                    cursor = json.loads(response.content)['next_cursor']
+                return response
+            return run
+
+        cases = [
+            ('alerts: first page', page(list_alerts)),
+            ('alerts: unviewed, stream', page(list_alerts, viewed='false', stream=stream.id)),
+            ('alerts: last 7 days', page(list_alerts, since=week_ago)),
+            ('alerts: 20 pages deep', walk(list_alerts, 20)),
+            ('detections: first page', page(list_detections)),
+            ('detections: stream, conf>=0.9', page(list_detections, stream=stream.id, min_confidence='0.9')),
+            ('detections: 20 pages deep', walk(list_detections, 20)),
+        ]
+        if not options['skip_legacy']:
+            cases.append(('alerts: legacy full list', legacy_list_alerts))
+
+        self.stdout.write(f"\n{rows} detections / alerts")
+        self.stdout.write(f"{'case':<34} {'ms':>10} {'peak MB':>9}")
+        for name, func in cases:
+            _, ms, peak = measure(func)
+            if name.endswith('pages deep'):
+                ms /= 20
+                name += ' (per page)'
+            self.stdout.write(f"{name:<34} {ms:>10.1f} {peak:>9.1f}")
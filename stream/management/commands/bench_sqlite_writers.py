@@ -0,0 +1,173 @@
+import os
+import queue
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+SCHEMA = """
+CREATE TABLE detection (id INTEGER PRIMARY KEY, stream_id INTEGER, confidence REAL, image_path TEXT, timestamp REAL);
+CREATE TABLE alert (id INTEGER PRIMARY KEY, detection_id INTEGER, viewed INTEGER, timestamp REAL);
+CREATE INDEX detection_stream_time ON detection (stream_id, timestamp);
+CREATE INDEX alert_time ON alert (timestamp);
+"""
+
+
+def insert_detection(cursor, stream_id):
+    now_time = time.time()
+    cursor.execute(
+        "INSERT INTO detection (stream_id, confidence, image_path, timestamp) VALUES (?, ?, ?, ?)",
+        (stream_id, 0.97, f"detections/{stream_id}/{now_time}.jpg", now_time),
+    )
+    cursor.execute(
+        "INSERT INTO alert (detection_id, viewed, timestamp) VALUES (?, 0, ?)", (cursor.lastrowid, now_time),
+    )
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Compare concurrent detection inserts on SQLite: one connection per stream vs WAL and a single writer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=50)
+        parser.add_argument('--rate', type=float, default=10, help='Detections per second per stream')
+        parser.add_argument('--readers', type=int, default=4, help='Threads running the alert listing query')
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--batch', type=int, default=32, help='Most jobs per writer transaction')
+
+    def handle(self, *args, **options):
+        for mode in ('legacy', 'wal_single_writer'):
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, 'bench.sqlite3')
+                setup = sqlite3.connect(path)
+                setup.executescript(SCHEMA)
+                setup.close()
+                result = self.run_mode(mode, path, options)
+            self.report(mode, result, options['seconds'])
+
+    def connect(self, mode, path):
+        if mode == 'legacy':
+            # Python's (and Django's) defaults: rollback journal, 5 s busy timeout, autocommit per insert
+            return sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn = sqlite3.connect(path, timeout=20, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def run_mode(self, mode, path, options):
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'rows': 0, 'errors': 0, 'latencies': [], 'read_latencies': [], 'read_errors': 0, 'transactions': 0}
+        jobs = queue.Queue()
+
+        def count(key, value=1):
+            with lock:
+                result[key] += value
+
+        def record(key, value):
+            with lock:
+                result[key].append(value)
+
+        def stream(stream_id):
+            conn = self.connect(mode, path) if mode == 'legacy' else None
+            interval = 1 / options['rate']
+            next_at = time.perf_counter()
+            while not stop.is_set():
+                next_at += interval
+                submitted = time.perf_counter()
+                if conn is None:
+                    jobs.put((stream_id, submitted))
+                else:
+                    try:
+                        cursor = conn.cursor()
+                        # Like Detection.save() followed by Alert.objects.create(): two commits
+                        insert_detection(cursor, stream_id)
+                        count('rows')
+                        record('latencies', time.perf_counter() - submitted)
+                    except sqlite3.OperationalError:
+                        count('errors')
+                time.sleep(max(0, next_at - time.perf_counter()))
+            if conn is not None:
+                conn.close()
+
+        def writer():
+            conn = self.connect(mode, path)
+            cursor = conn.cursor()
+            while not stop.is_set() or not jobs.empty():
+                try:
+                    batch = [jobs.get(timeout=0.1)]
+                except queue.Empty:
+                    continue
+                while len(batch) < options['batch']:
+                    try:
+                        batch.append(jobs.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    cursor.execute('BEGIN IMMEDIATE')
+                    for stream_id, _ in batch:
+                        insert_detection(cursor, stream_id)
+                    cursor.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    conn.rollback()
+                    count('errors', len(batch))
+                    continue
+                committed = time.perf_counter()
+                with lock:
+                    result['transactions'] += 1
+                    result['rows'] += len(batch)
+                    result['latencies'].extend(committed - submitted for _, submitted in batch)
+            conn.close()
+
+        def reader():
+            conn = self.connect(mode, path)
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    conn.execute(
+                        "SELECT alert.id, detection.stream_id, detection.image_path FROM alert "
+                        "JOIN detection ON detection.id = alert.detection_id ORDER BY alert.timestamp DESC LIMIT 50"
+                    ).fetchall()
+                    record('read_latencies', time.perf_counter() - start)
+                except sqlite3.OperationalError:
+                    count('read_errors')
+                time.sleep(0.05)
+            conn.close()
+
+        threads = [threading.Thread(target=stream, args=(stream_id,)) for stream_id in range(options['streams'])]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        if mode != 'legacy':
+            threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def report(self, mode, result, seconds):
+        latencies = [value * 1000 for value in result['latencies']]
+        reads = [value * 1000 for value in result['read_latencies']]
+        self.stdout.write(f"\n{mode}")
+        self.stdout.write(f"  inserted:        {result['rows']} detections ({result['rows'] / seconds:.0f}/s)")
+        if result['transactions']:
+            self.stdout.write(f"  transactions:    {result['transactions']} ({result['rows'] / result['transactions']:.1f} rows each)")
+        self.stdout.write(f"  locked errors:   {result['errors']} writes, {result['read_errors']} reads")
+        self.stdout.write(
+            f"  write latency:   p50 {percentile(latencies, 0.5):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms, "
+            f"max {max(latencies, default=0):.1f} ms"
+        )
+        self.stdout.write(
+            f"  read latency:    p50 {percentile(reads, 0.5):.1f} ms, p99 {percentile(reads, 0.99):.1f} ms "
+            f"({len(reads)} queries, mean {statistics.fmean(reads) if reads else 0:.1f} ms)"
+        )
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stream.models import Stream
+from stream.services.retention import RetentionPruner
+
+
+class Command(BaseCommand):
+    help = "Apply each stream's retention policy: delete old detections/alerts and their snapshot files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stream', type=int, action='append', dest='streams', help="Only prune this stream (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Detections deleted per transaction")
+        parser.add_argument('--pause-ms', type=int, default=50, help="Pause between batches to let live inserts in")
+        parser.add_argument('--interval', type=int, default=0, help="Keep running, pruning every N seconds")
+
+    def handle(self, *args, **options):
+        pruner = RetentionPruner(batch_size=options['batch_size'], pause=options['pause_ms'] / 1000)
+        while True:
+            self.run(pruner, options['streams'])
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def run(self, pruner, stream_ids):
+        start = time.time()
+        streams = Stream.objects.all()
+        if stream_ids:
+            streams = streams.filter(id__in=stream_ids)
+
+        total = {'detections': 0, 'files': 0, 'bytes': 0}
+        for stream in streams:
+            report = pruner.prune_stream(stream)
+            if report['detections'] or report['files']:
+                self.stdout.write(
+                    f"🧹 Stream {stream.id} ({stream.name}): {report['detections']} detection(s), "
+                    f"{report['files']} file(s), {report['bytes'] / (1024 * 1024):.1f} MB"
+                )
+            for key in total:
+                total[key] += report[key]
+
+        if not stream_ids:
+            legacy = pruner.prune_legacy_snapshots(settings.RETENTION_DAYS)
+            total['files'] += legacy['files']
+            total['bytes'] += legacy['bytes']
+
+        self.stdout.write(
+            f"✅ Pruned {total['detections']} detection(s) and {total['files']} file(s), "
+            f"reclaimed {total['bytes'] / (1024 * 1024):.1f} MB in {time.time() - start:.1f}s"
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from stream.services.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the minute/hour detection rollups from the Detection table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stream', type=int, action='append', dest='streams',
+                            help="Only rebuild this stream (repeatable)")
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups(options['streams'])
+        self.stdout.write(f"📊 Rebuilt {rows} rollup bucket(s)")
@@ -0,0 +1,39 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stream.services.detector import detector_registry
+from stream.services.metrics import serve_metrics
+from stream.services.supervisor import DetectionSupervisor
+
+
+class Command(BaseCommand):
+    help = "Run face detection for every stream with detection_enabled, independent of connected viewers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile-interval', type=int, default=30,
+                            help="Seconds between full re-syncs with the Stream table")
+        parser.add_argument('--node-id', default=None,
+                            help="Name this node holds camera leases under (default: DETECTION_NODE_ID or host:pid)")
+        parser.add_argument('--metrics-port', type=int, default=settings.DETECTION_METRICS_PORT,
+                            help="Serve Prometheus metrics on this port (default: DETECTION_METRICS_PORT, 0 = off)")
+
+    def handle(self, *args, **options):
+        detector_registry.preload()
+        supervisor = DetectionSupervisor(
+            reconcile_interval=options['reconcile_interval'],
+            node_id=options['node_id'],
+        )
+        try:
+            asyncio.run(self.run(supervisor, options['metrics_port']))
+        except KeyboardInterrupt:
+            self.stdout.write("🛑 Detection supervisor stopped")
+
+    async def run(self, supervisor, metrics_port):
+        server = await serve_metrics(metrics_port) if metrics_port else None
+        try:
+            await supervisor.run()
+        finally:
+            if server:
+                server.close()
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 # 1. Users
 class User(AbstractUser):
@@ -8,12 +9,35 @@ class User(AbstractUser):
         return self.username
 
 # 2. Streams
+DETECTOR_BACKEND_CHOICES = [
+    ('mtcnn', 'MTCNN'),
+    ('yunet', 'OpenCV YuNet (ONNX)'),
+    ('ssd', 'OpenCV res10 SSD'),
+    ('haar', 'Haar cascade'),
+]
+
 class Stream(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     rtsp_url = models.URLField()
     detection_enabled = models.BooleanField(default=True)
     confidence_threshold = models.FloatField(default=0.8)
+    detector_backend = models.CharField(max_length=20, choices=DETECTOR_BACKEND_CHOICES, default='mtcnn')
+    # Ingest format: ffmpeg fps filter (0 = camera rate), preview size, and a smaller detection width (0 = preview size)
+    ingest_fps = models.FloatField(default=15)
+    preview_width = models.PositiveIntegerField(default=640)
+    preview_height = models.PositiveIntegerField(default=480)
+    detection_width = models.PositiveIntegerField(default=320)
+    # Run the face detector on every Nth sampled frame and track faces in between
+    detection_interval_frames = models.PositiveIntegerField(default=1)
+    # Motion gate: skip detection unless this fraction of pixels changed, but still detect every motion_min_interval seconds
+    motion_gate_enabled = models.BooleanField(default=False)
+    motion_sensitivity = models.FloatField(default=0.02)
+    motion_min_interval = models.FloatField(default=5.0)
+    # Retention: prune detections older than N days, beyond N rows, or once snapshots exceed N MB (null = global default, 0 = no limit)
+    retention_days = models.PositiveIntegerField(null=True, blank=True)
+    retention_max_detections = models.PositiveIntegerField(null=True, blank=True)
+    retention_max_mb = models.PositiveIntegerField(null=True, blank=True)
     last_connected = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=50, default="offline")
 
@@ -21,14 +45,56 @@ class Stream(models.Model):
         return self.name
 
 # 3. Detections
+def snapshot_upload_to(instance, filename):
+    # Sharded per stream and day, so retention drops whole day folders instead of listing one huge directory
+    return f"detections/{instance.stream_id}/{instance.timestamp or timezone.now():%Y/%m/%d}/{filename}"
+
 class Detection(models.Model):
     stream = models.ForeignKey(Stream, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add, so the background writer can store when the face was seen
+    timestamp = models.DateTimeField(default=timezone.now)
     confidence_score = models.FloatField()
-    image_path = models.ImageField(upload_to='detections/')
+    image_path = models.ImageField(upload_to=snapshot_upload_to)
+
+    class Meta:
+        # Keyset pagination walks (timestamp, id) newest first, optionally within one stream
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='detection_time_idx'),
+            models.Index(fields=['stream', 'timestamp', 'id'], name='detection_stream_time_idx'),
+        ]
 
 # 4. Alerts
 class Alert(models.Model):
     detection = models.OneToOneField(Detection, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     viewed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='alert_time_idx'),
+            models.Index(fields=['viewed', 'timestamp', 'id'], name='alert_viewed_time_idx'),
+        ]
+
+# 5. Detection rollups, maintained as detections are saved so dashboards never scan Detection/Alert
+ROLLUP_GRANULARITY_CHOICES = [
+    ('minute', 'Minute'),
+    ('hour', 'Hour'),
+]
+
+class DetectionRollup(models.Model):
+    stream = models.ForeignKey(Stream, on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=10, choices=ROLLUP_GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()  # start of the minute/hour, UTC
+    count = models.PositiveIntegerField(default=0)
+    alert_count = models.PositiveIntegerField(default=0)
+    max_confidence = models.FloatField(default=0)
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stream', 'granularity', 'bucket'], name='rollup_stream_bucket_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'bucket'], name='rollup_time_idx'),
+        ]
@@ -0,0 +1,145 @@
+import os
+
+import cv2
+import numpy as np
+
+# Face detector backends. Like detection_pool, this module stays free of Django
+# imports so worker processes can build backends without setting up the project.
+# Every backend takes BGR frames and returns (x, y, w, h, confidence) tuples.
+
+
+class DetectorBackend:
+    name = None
+
+    def __init__(self, model_dir=None):
+        self.model_dir = model_dir
+
+    def detect(self, frame_bgr):
+        raise NotImplementedError
+
+    def detect_batch(self, frames_bgr):
+        return [self.detect(frame) for frame in frames_bgr]
+
+    def model_path(self, filename):
+        path = os.path.join(self.model_dir or '', filename)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{self.name} model file not found: {path}")
+        return path
+
+
+class MTCNNBackend(DetectorBackend):
+    name = 'mtcnn'
+
+    def __init__(self, model_dir=None):
+        super().__init__(model_dir)
+        # Imported here so the other backends don't pay for loading TensorFlow
+        from mtcnn import MTCNN
+        self.detector = MTCNN()
+
+    def detect(self, frame_bgr):
+        return self.detect_batch([frame_bgr])[0]
+
+    def detect_batch(self, frames_bgr):
+        rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames_bgr]
+        batch = None
+        if len(rgb_frames) > 1:
+            # mtcnn>=1.0 runs a list of images through each stage as one stacked batch
+            try:
+                batch = self.detector.detect_faces(rgb_frames)
+                if not (isinstance(batch, list) and len(batch) == len(rgb_frames) and all(isinstance(d, list) for d in batch)):
+                    batch = None
+            except Exception:
+                batch = None
+        if batch is None:
+            batch = [self.detector.detect_faces(rgb_frame) for rgb_frame in rgb_frames]
+        return [
+            [(int(d['box'][0]), int(d['box'][1]), int(d['box'][2]), int(d['box'][3]), float(d['confidence'])) for d in detections]
+            for detections in batch
+        ]
+
+
+class HaarCascadeBackend(DetectorBackend):
+    name = 'haar'
+
+    def __init__(self, model_dir=None, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        super().__init__(model_dir)
+        self.classifier = cv2.CascadeClassifier(
+            os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        )
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, frame_bgr):
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        faces = self.classifier.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=self.min_size
+        )
+        # Cascades don't produce a probability; every hit that survives min_neighbors counts as certain
+        return [(int(x), int(y), int(w), int(h), 1.0) for x, y, w, h in faces]
+
+
+class YuNetBackend(DetectorBackend):
+    name = 'yunet'
+    model_file = 'face_detection_yunet_2023mar.onnx'
+
+    def __init__(self, model_dir=None, score_threshold=0.3, nms_threshold=0.3):
+        super().__init__(model_dir)
+        self.detector = cv2.FaceDetectorYN.create(
+            self.model_path(self.model_file), '', (320, 320), score_threshold, nms_threshold
+        )
+        self.input_size = (320, 320)
+
+    def detect(self, frame_bgr):
+        height, width = frame_bgr.shape[:2]
+        if self.input_size != (width, height):
+            self.detector.setInputSize((width, height))
+            self.input_size = (width, height)
+        _, faces = self.detector.detect(frame_bgr)
+        if faces is None:
+            return []
+        # Rows are x, y, w, h, five landmark pairs, score
+        return [(int(f[0]), int(f[1]), int(f[2]), int(f[3]), float(f[14])) for f in faces]
+
+
+class SSDBackend(DetectorBackend):
+    name = 'ssd'
+    config_file = 'deploy.prototxt'
+    model_file = 'res10_300x300_ssd_iter_140000.caffemodel'
+
+    def __init__(self, model_dir=None, min_confidence=0.3):
+        super().__init__(model_dir)
+        self.net = cv2.dnn.readNetFromCaffe(self.model_path(self.config_file), self.model_path(self.model_file))
+        self.min_confidence = min_confidence
+
+    def detect(self, frame_bgr):
+        return self.detect_batch([frame_bgr])[0]
+
+    def detect_batch(self, frames_bgr):
+        # The res10 network takes a real NCHW batch in a single forward pass
+        blob = cv2.dnn.blobFromImages(frames_bgr, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        output = self.net.forward()  # shape (1, 1, N, 7): image_id, label, confidence, x1, y1, x2, y2
+
+        results = [[] for _ in frames_bgr]
+        for image_id, _, confidence, x1, y1, x2, y2 in output[0, 0]:
+            if confidence < self.min_confidence:
+                continue
+            height, width = frames_bgr[int(image_id)].shape[:2]
+            x1, y1, x2, y2 = (np.array([x1, y1, x2, y2]).clip(0, 1) * [width, height, width, height]).astype(int)
+            results[int(image_id)].append((int(x1), int(y1), int(x2 - x1), int(y2 - y1), float(confidence)))
+        return results
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (MTCNNBackend, HaarCascadeBackend, YuNetBackend, SSDBackend)
+}
+
+
+def create_backend(name, model_dir=None):
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown detector backend: {name}")
+    return backend_class(model_dir=model_dir)
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from collections import deque
+
+from django.conf import settings
+
+from stream.services import metrics
+from stream.services.detector import detector_registry
+
+
+class BatchScheduler:
+    # Collects detection requests from every stream for a short window and runs them as one batch
+    def __init__(self, max_batch_size=8, max_wait=0.015, window_size=200):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # Frames are only batched with others headed for the same backend
+        self.pending = {}
+        self.flush_handles = {}
+        self.running = {}  # backend -> frames in batches being detected
+        self.batch_sizes = deque(maxlen=window_size)
+        self.queue_waits = deque(maxlen=window_size)
+        self.total_batches = 0
+        self.total_frames = 0
+
+    async def detect(self, frame, backend=None):
+        backend = backend or settings.DEFAULT_DETECTOR_BACKEND
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self.pending.setdefault(backend, [])
+        pending.append((frame, future, time.time()))
+
+        if len(pending) >= self.max_batch_size:
+            self.flush(backend)
+        elif backend not in self.flush_handles:
+            self.flush_handles[backend] = loop.call_later(self.max_wait, self.flush, backend)
+
+        return await future
+
+    def flush(self, backend):
+        handle = self.flush_handles.pop(backend, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self.pending.pop(backend, None)
+        if not batch:
+            return
+        asyncio.get_running_loop().create_task(self.run_batch(backend, batch))
+
+    async def run_batch(self, backend, batch):
+        dispatched_at = time.time()
+        for _, _, enqueued_at in batch:
+            self.queue_waits.append(dispatched_at - enqueued_at)
+        self.batch_sizes.append(len(batch))
+        self.total_batches += 1
+        self.total_frames += len(batch)
+
+        size = len(batch)
+        self.running[backend] = self.running.get(backend, 0) + size
+        try:
+            detector = await asyncio.to_thread(detector_registry.get, backend)
+            # A frame the detector can't take fails on its own instead of taking the batch down
+            batch = [item for item in batch if self.accept(detector, item)]
+            frames = [frame for frame, _, _ in batch]
+            results = await asyncio.to_thread(detector.detect_faces_batch, frames) if frames else []
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.running[backend] -= size
+
+        for (_, future, _), detections in zip(batch, results):
+            if not future.done():
+                future.set_result(detections)
+
+    def accept(self, detector, item):
+        frame, future, _ = item
+        try:
+            detector.check_frame(frame)
+        except ValueError as e:
+            if not future.done():
+                future.set_exception(e)
+            return False
+        return True
+
+    def queue_depths(self):
+        backends = set(self.pending) | set(self.running)
+        return {
+            (backend,): len(self.pending.get(backend, ())) + self.running.get(backend, 0)
+            for backend in backends
+        }
+
+    def get_stats(self):
+        avg_batch = sum(self.batch_sizes) / len(self.batch_sizes) if self.batch_sizes else 0
+        avg_wait = sum(self.queue_waits) / len(self.queue_waits) if self.queue_waits else 0
+        return {
+            'avg_batch_size': round(avg_batch, 2),
+            'max_batch_size': max(self.batch_sizes, default=0),
+            'avg_queue_wait': round(avg_wait * 1000, 2),                   # ms
+            'max_queue_wait': round(max(self.queue_waits, default=0) * 1000, 2),  # ms
+            'queue_depth': sum(len(pending) for pending in self.pending.values()),
+            'total_batches': self.total_batches,
+            'total_frames': self.total_frames,
+        }
+
+
+batch_scheduler = BatchScheduler(
+    max_batch_size=getattr(settings, 'DETECTION_BATCH_SIZE', 8),
+    max_wait=getattr(settings, 'DETECTION_BATCH_WAIT_MS', 15) / 1000,
+)
+
+metrics.registry.gauge(
+    'rtsp_detector_queue_depth', 'Frames waiting for or inside a detection batch', ('backend',),
+    collect=batch_scheduler.queue_depths,
+)
@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import random
+import subprocess
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+
+from stream.services import metrics
+from stream.services.frame_reader import FrameReader
+from stream.services.logs import NOISY_FFMPEG_KINDS, classify_ffmpeg_line, stream_logger
+from stream.services.stream_status import stream_status_writer
+
+# Best state wins when one camera is read at several output formats
+STATE_RANK = {'offline': 0, 'connecting': 1, 'stalled': 2, 'live': 3}
+
+
+class Subscription:
+    def __init__(self, source, maxsize=2):
+        self.source = source
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, frame):
+        # Slow subscribers only ever lose their oldest frame, never block the reader
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+                self.source.dropped_metric.inc()
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(frame)
+
+    def depth(self):
+        return self.queue.qsize()
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class CameraSource:
+    def __init__(self, key, rtsp_url, width=640, height=480, fps=None, label=None, hub=None):
+        self.key = key
+        self.rtsp_url = rtsp_url
+        self.hub = hub
+        self.label = label or metrics.stream_label(rtsp_url=rtsp_url)
+        self.read_metric = metrics.stage_seconds.labels(self.label, 'read')
+        self.dropped_metric = metrics.frames_dropped.labels(self.label, 'ingest')
+        self.restarts_metric = metrics.ingest_restarts.labels(self.label)
+        self.log = stream_logger(self.label)
+        self.ffmpeg_messages = Counter()
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_size = width * height * 3  # bgr24
+        self.subscribers = set()
+        self.process = None
+        self.task = None
+        self.log_task = None
+        self.reader = None
+        # Health: connecting -> live -> stalled/offline -> connecting ...
+        self.state = 'offline'
+        self.restarts = 0
+        self.sessions = 0
+        self.session_frames = 0
+        self.last_frame_time = None
+        self.measured_fps = 0.0
+        self.fps_window_start = None
+        self.fps_window_frames = 0
+        self.live_since = None
+        self.down_since = None
+        self.uptime = 0.0  # live seconds of earlier sessions
+        self.reconnect_times = deque(maxlen=20)
+
+    def build_command(self):
+        # Drop unneeded frames inside ffmpeg so they are never converted to raw and piped
+        video_filter = f'scale={self.width}:{self.height}'
+        if self.fps:
+            video_filter = f'fps={self.fps},{video_filter}'
+        return [
+            'ffmpeg',
+            # Only warnings and errors on stderr, and no progress lines (they end in \r, not \n)
+            '-hide_banner', '-nostats', '-loglevel', settings.INGEST_FFMPEG_LOGLEVEL,
+            '-rtsp_transport', 'tcp',
+            '-fflags', 'nobuffer',
+            '-flags', 'low_delay',
+            '-flush_packets', '1',
+            '-avioflags', 'direct',
+            '-analyzeduration', '10000000',
+            '-probesize', '10000000',
+            '-i', self.rtsp_url,
+            '-vf', video_filter,
+            '-f', 'image2pipe',
+            '-pix_fmt', 'bgr24',
+            '-vcodec', 'rawvideo',
+            '-'
+        ]
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        # Keep ffmpeg running for as long as anyone is subscribed; viewers and pipelines
+        # stay attached across reconnects and simply see frames resume
+        attempt = 0
+        self.down_since = time.time()
+        try:
+            while True:
+                self.set_state('connecting')
+                await self.run_ffmpeg()
+                if self.session_frames:
+                    attempt = 0  # it was live, so this is a fresh outage
+                if self.state != 'stalled':
+                    self.set_state('offline')
+                delay = self.backoff_delay(attempt)
+                attempt += 1
+                self.restarts += 1
+                self.restarts_metric.inc()
+                self.log.info("🔁 Reconnecting %s in %.1fs (attempt %d)", self.format_name(), delay, attempt)
+                await asyncio.sleep(delay)
+        finally:
+            self.set_state('offline')
+            self.publish(None)
+            await self.close()
+
+    def backoff_delay(self, attempt):
+        # Exponential backoff with jitter, so cameras behind one flapping switch don't reconnect in lockstep
+        delay = min(settings.INGEST_BACKOFF_MAX, settings.INGEST_BACKOFF_BASE * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def run_ffmpeg(self):
+        self.session_frames = 0
+        try:
+            self.process = subprocess.Popen(
+                self.build_command(),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                # Default-size buffer: large readinto() calls go straight into FrameReader's frames
+            )
+        except Exception as e:
+            self.log.error("❌ Failed to start ffmpeg process for %s: %s", self.format_name(), e)
+            return
+
+        self.log.info("🎬 Started ffmpeg ingest for %s", self.format_name())
+        self.log_task = asyncio.create_task(self.log_ffmpeg_errors())
+
+        finished = asyncio.Event()
+        self.reader = FrameReader(
+            self.process.stdout, self.width, self.height,
+            loop=asyncio.get_running_loop(),
+            on_frame=self.on_frame,
+            on_eof=finished.set,
+            log=self.log,
+        )
+        watchdog = asyncio.create_task(self.watch(finished))
+        try:
+            self.reader.start()
+            await finished.wait()
+        except Exception as e:
+            self.log.error("🔥 Ingest error for %s: %s", self.format_name(), e)
+        finally:
+            watchdog.cancel()
+            self.reader.stop()
+            await self.close()
+
+    async def watch(self, finished):
+        # The reader thread blocks in readinto() while the camera hangs; kill ffmpeg so it sees EOF
+        started = time.monotonic()
+        while not finished.is_set():
+            await asyncio.sleep(1)
+            if self.session_frames:
+                since, timeout = self.last_frame_time, settings.INGEST_STALL_TIMEOUT
+            else:
+                since, timeout = started, settings.INGEST_CONNECT_TIMEOUT
+            if time.monotonic() - since > timeout:
+                self.log.warning("⏱️ No frame from %s for %gs, restarting ffmpeg", self.format_name(), timeout)
+                self.set_state('stalled')
+                if self.process:
+                    self.process.kill()
+                return
+
+    def on_frame(self, frame, read_time=None):
+        if read_time is not None:
+            self.read_metric.observe(read_time)
+        self.last_frame_time = time.monotonic()
+        self.session_frames += 1
+        # Delivered frame rate, refreshed about once a second
+        if self.fps_window_start is None:
+            self.fps_window_start = self.last_frame_time
+        else:
+            self.fps_window_frames += 1
+        elapsed = self.last_frame_time - self.fps_window_start
+        if elapsed >= 1:
+            self.measured_fps = self.fps_window_frames / elapsed
+            self.fps_window_start = self.last_frame_time
+            self.fps_window_frames = 0
+        if self.state != 'live':
+            self.set_state('live')
+        self.publish(frame)
+
+    def set_state(self, state):
+        if state == self.state:
+            return
+        now = time.time()
+        if self.state == 'live':
+            self.uptime += now - self.live_since
+            self.live_since = None
+            self.down_since = now
+        if state == 'live':
+            self.fps_window_start = None
+            self.fps_window_frames = 0
+            if self.sessions and self.down_since:
+                self.reconnect_times.append(now - self.down_since)
+            self.sessions += 1
+            self.live_since = now
+        self.state = state
+        self.log.info("📶 %s is %s", self.format_name(), state)
+        # Stream.status is per camera: a stalled small feed mustn't mark a camera that is live elsewhere
+        stream_status_writer.report(self.rtsp_url, self.hub.camera_state(self.rtsp_url) if self.hub else state)
+
+    def get_health(self):
+        now = time.time()
+        session_uptime = now - self.live_since if self.live_since else 0
+        return {
+            'state': self.state,
+            'restarts': self.restarts,
+            'uptime': round(self.uptime + session_uptime, 1),
+            'session_uptime': round(session_uptime, 1),
+            'last_reconnect_time': round(self.reconnect_times[-1], 2) if self.reconnect_times else None,
+            'avg_reconnect_time': round(sum(self.reconnect_times) / len(self.reconnect_times), 2) if self.reconnect_times else None,
+            'ffmpeg_messages': dict(self.ffmpeg_messages),
+        }
+
+    def format_name(self):
+        # The camera's output format; the stream itself is on every record, and URLs may hold credentials
+        return f"{self.width}x{self.height}" + (f"@{self.fps}fps" if self.fps else "")
+
+    async def log_ffmpeg_errors(self):
+        # Every stderr line is counted by kind; routine network/decoder noise is only logged at DEBUG
+        process = self.process
+        while process:
+            try:
+                err_line = await asyncio.to_thread(process.stderr.readline)
+            except ValueError:
+                self.log.debug("⚠️ Tried to read from closed stderr")
+                break
+            if not err_line:
+                break
+            line = err_line.decode(errors="ignore").strip()
+            if not line:
+                continue
+            kind = classify_ffmpeg_line(line)
+            self.ffmpeg_messages[kind] += 1
+            metrics.ffmpeg_messages.labels(self.label, kind).inc()
+            self.log.log(logging.DEBUG if kind in NOISY_FFMPEG_KINDS else logging.WARNING, "FFmpeg %s: %s", kind, line)
+
+    def publish(self, frame):
+        for subscription in list(self.subscribers):
+            subscription.put(frame)
+
+    async def close(self):
+        process, self.process = self.process, None
+        if process:
+            self.log.info("🧹 Killing ffmpeg process for %s", self.format_name())
+            process.kill()
+            await asyncio.sleep(0.1)
+            if process.stdout:
+                process.stdout.close()
+            if process.stderr:
+                process.stderr.close()
+
+        if self.log_task:
+            self.log_task.cancel()
+            try:
+                await self.log_task
+            except asyncio.CancelledError:
+                pass
+            self.log_task = None
+
+    async def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self.close()
+
+
+class CameraHub:
+    # Process-wide registry: one ffmpeg reader per camera, fanned out to every viewer
+    def __init__(self):
+        self.sources = {}
+        self.lock = asyncio.Lock()
+
+    def make_key(self, rtsp_url, width=640, height=480, fps=None):
+        # Viewers share an ingest only when they want the same camera at the same output format
+        if (width, height, fps) == (640, 480, None):
+            return rtsp_url
+        return f"{rtsp_url}@{width}x{height}" + (f"/{fps}fps" if fps else "")
+
+    async def subscribe(self, rtsp_url, width=640, height=480, fps=None, stream_id=None):
+        key = self.make_key(rtsp_url, width, height, fps)
+        async with self.lock:
+            source = self.sources.get(key)
+            if source is None or source.task is None or source.task.done():
+                # Metrics of a camera are labelled by the stream of whoever started reading it
+                source = CameraSource(
+                    key, rtsp_url, width, height, fps, label=metrics.stream_label(stream_id, rtsp_url), hub=self,
+                )
+                self.sources[key] = source
+                source.start()
+            subscription = source.subscribe()
+            source.log.info("👀 %d viewer(s) on %s", len(source.subscribers), source.format_name())
+            return subscription
+
+    async def unsubscribe(self, subscription):
+        source = subscription.source
+        async with self.lock:
+            source.unsubscribe(subscription)
+            if source.subscribers:
+                return
+            # Last viewer left: stop decoding
+            if self.sources.get(source.key) is source:
+                del self.sources[source.key]
+        await source.stop()
+
+    def camera_state(self, rtsp_url):
+        # Best state across the output formats being read from one camera
+        states = [source.state for source in list(self.sources.values()) if source.rtsp_url == rtsp_url]
+        return max(states, key=STATE_RANK.get, default='offline')
+
+    def get_live_status(self):
+        # Per camera URL, merged across output formats; also read from request threads, so only copies
+        status = {}
+        for source in list(self.sources.values()):
+            entry = status.setdefault(source.rtsp_url, {'state': 'offline', 'fps': 0, 'viewers': 0})
+            if STATE_RANK[source.state] > STATE_RANK[entry['state']]:
+                entry['state'] = source.state
+            if source.state == 'live':
+                entry['fps'] = max(entry['fps'], round(source.measured_fps, 1))
+            entry['viewers'] += len(source.subscribers)
+        return status
+
+
+camera_hub = CameraHub()
+
+metrics.registry.gauge(
+    'rtsp_ingest_up', 'Whether ffmpeg is currently delivering frames', ('stream',),
+    collect=lambda: {(source.label,): int(source.state == 'live') for source in list(camera_hub.sources.values())},
+)
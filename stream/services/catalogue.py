@@ -0,0 +1,128 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from stream.models import Stream
+from stream.services.camera_hub import camera_hub
+from stream.services.stream_init import generate_ws_url
+
+
+def serialize_stream(stream):
+    return {
+        "id": stream.id,
+        "name": stream.name,
+        "description": stream.description,
+        "rtsp_url": stream.rtsp_url,
+        "confidence_threshold": stream.confidence_threshold,
+        "detection_enabled": stream.detection_enabled,
+        "detector_backend": stream.detector_backend,
+        "ingest_fps": stream.ingest_fps,
+        "preview_width": stream.preview_width,
+        "preview_height": stream.preview_height,
+        "detection_width": stream.detection_width,
+        "detection_interval_frames": stream.detection_interval_frames,
+        "motion_gate_enabled": stream.motion_gate_enabled,
+        "motion_sensitivity": stream.motion_sensitivity,
+        "motion_min_interval": stream.motion_min_interval,
+        "retention_days": stream.retention_days,
+        "retention_max_detections": stream.retention_max_detections,
+        "retention_max_mb": stream.retention_max_mb,
+        "status": stream.status,
+        "last_connected": stream.last_connected,
+        "ws_url": generate_ws_url(stream.rtsp_url)
+    }
+
+
+def digest(value):
+    return hashlib.blake2b(json.dumps(value, cls=DjangoJSONEncoder).encode(), digest_size=12).hexdigest()
+
+
+class StreamCatalogue:
+    # Serialized streams, rebuilt only when a stream view changed something, or after max_age
+    # seconds to pick up edits made elsewhere (admin, status writer, another server process).
+    # Live state (online, fps, viewers) comes from camera_hub on every read, never from the database.
+    # That hub only knows this process's cameras: with DETECTION_SUPERVISOR the ingest runs in
+    # run_detectors, so status falls back to Stream.status and fps/viewers read 0 here.
+    def __init__(self, max_age=30):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.streams = None   # id -> serialized stream
+        self.built_at = 0
+        self.generation = 0   # bumped by invalidate(), so a rebuild racing with it isn't kept
+        self.version = 0
+        self.digest = None
+        self.modified_at = time.time()
+        self.live = {}   # stream id (None for the full list) -> (live digest, changed at)
+        self.hits = 0
+        self.rebuilds = 0
+
+    def invalidate(self):
+        with self.lock:
+            self.streams = None
+            self.generation += 1
+            # Forget entries of deleted streams
+            self.live = {}
+
+    def get_streams(self):
+        with self.lock:
+            if self.streams is not None and time.monotonic() - self.built_at < self.max_age:
+                self.hits += 1
+                return self.streams
+            generation = self.generation
+        streams = {stream.id: serialize_stream(stream) for stream in Stream.objects.order_by('id')}
+        new_digest = digest(list(streams.values()))
+        with self.lock:
+            self.rebuilds += 1
+            if generation != self.generation:
+                return streams
+            self.streams = streams
+            self.built_at = time.monotonic()
+            # A rebuild that finds nothing new keeps the version, so clients keep their cached copy
+            if new_digest != self.digest:
+                self.digest = new_digest
+                self.version += 1
+                self.modified_at = time.time()
+            return streams
+
+    def snapshot(self, stream_id=None):
+        # Returns (streams with live state merged in, etag, last modified timestamp)
+        streams = self.get_streams()
+        if stream_id is not None:
+            streams = {stream_id: streams[stream_id]} if stream_id in streams else {}
+        live = camera_hub.get_live_status()
+
+        merged = []
+        states = []
+        for stream in streams.values():
+            status = live.get(stream['rtsp_url'])
+            if status is None:
+                state, fps, viewers = stream['status'], 0, 0
+            else:
+                state, fps, viewers = status['state'], status['fps'], status['viewers']
+            merged.append({**stream, 'status': state, 'online': state == 'live', 'fps': fps, 'viewers': viewers})
+            states.append((stream['id'], state, viewers))
+
+        # fps jitters by a frame or two every second; leaving it out of the ETag keeps polls at 304
+        live_digest = digest(states)
+        with self.lock:
+            previous = self.live.get(stream_id)
+            if previous is None or previous[0] != live_digest:
+                previous = self.live[stream_id] = (live_digest, time.time())
+            etag = f'W/"{self.digest}-{live_digest}"'
+            last_modified = max(self.modified_at, previous[1])
+        return merged, etag, last_modified
+
+    def get_stats(self):
+        return {
+            'version': self.version,
+            'streams': len(self.streams or {}),
+            'hits': self.hits,
+            'rebuilds': self.rebuilds,
+        }
+
+
+stream_catalogue = StreamCatalogue(max_age=settings.STREAM_CATALOGUE_MAX_AGE)
@@ -0,0 +1,49 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+
+from stream.models import Alert, Detection
+
+# One background thread removes snapshot files, so requests and prune jobs never wait on the disk
+file_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot-cleanup')
+DELETE_BATCH = 500
+
+logger = logging.getLogger(__name__)
+
+
+def remove_files(names):
+    storage = Detection._meta.get_field('image_path').storage
+    removed = freed = 0
+    for name in names:
+        try:
+            size = storage.size(name)
+            storage.delete(name)
+        except (FileNotFoundError, OSError, NotImplementedError):
+            continue
+        removed += 1
+        freed += size
+    if removed:
+        logger.info("🧹 Removed %d snapshot file(s), %.1f MB", removed, freed / (1024 * 1024))
+    return removed, freed
+
+
+def remove_files_later(names):
+    names = [name for name in names if name]
+    if names:
+        file_executor.submit(remove_files, names)
+    return len(names)
+
+
+def delete_detections(detection_ids):
+    # Rows go in short transactions of DELETE_BATCH ids (alerts first, a plain set DELETE, then
+    # their detections); returns (detections deleted, snapshot names to remove)
+    deleted = 0
+    names = []
+    for start in range(0, len(detection_ids), DELETE_BATCH):
+        batch = detection_ids[start:start + DELETE_BATCH]
+        with transaction.atomic():
+            names.extend(name for name in Detection.objects.filter(id__in=batch).values_list('image_path', flat=True))
+            Alert.objects.filter(detection_id__in=batch).delete()
+            deleted += Detection.objects.filter(id__in=batch).delete()[1].get(Detection._meta.label, 0)
+    return deleted, names
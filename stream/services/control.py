@@ -0,0 +1,48 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+# Channel layer groups shared by the REST views, the detection supervisor and WebSocket viewers
+SUPERVISOR_GROUP = 'detection_supervisor'
+
+logger = logging.getLogger(__name__)
+
+
+def stream_group(stream_id):
+    return f"stream_{stream_id}"
+
+
+def notify_supervisor(stream_id, action):
+    # Best effort: the supervisor also reconciles against the database on a timer.
+    # Viewers of the stream get it too, to switch between following the supervisor and local ingest.
+    message = {
+        'type': 'stream.control',
+        'stream_id': stream_id,
+        'action': action,
+    }
+    send_to_supervisor(message)
+    send_to_supervisor(message, group=stream_group(stream_id))
+
+
+def broadcast_log_level(stream_id, level):
+    # Every detection node applies it to its own logger for the stream
+    send_to_supervisor({
+        'type': 'stream.log_level',
+        'stream_id': stream_id,
+        'level': level,
+    })
+
+
+def send_to_supervisor(message, group=SUPERVISOR_GROUP):
+    # Without a supervisor nobody listens, and an unreachable Redis would stall the calling request
+    if not settings.DETECTION_SUPERVISOR:
+        return
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group, message)
+    except Exception as e:
+        logger.warning("⚠️ Could not notify detection supervisor: %s", e)
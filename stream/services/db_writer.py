@@ -0,0 +1,99 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.utils import OperationalError
+
+from stream.services import metrics
+
+
+class DatabaseWriter:
+    # Every write the detection pipeline makes goes through this one thread and its one connection.
+    # Jobs queued while a transaction is running are committed together in the next one, so SQLite
+    # sees a single writer doing few, short transactions instead of many threads fighting for the lock.
+    def __init__(self, max_jobs_per_transaction=32):
+        self.max_jobs = max_jobs_per_transaction
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.transactions = 0
+        self.jobs_done = 0
+        self.failed = 0
+        self.commit_times = deque(maxlen=100)
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='db-writer', daemon=True)
+                self.thread.start()
+
+    def submit(self, func, *args):
+        future = Future()
+        self.jobs.put((func, args, future))
+        self.start()
+        return future
+
+    async def run_job(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def run(self):
+        while True:
+            batch = [self.jobs.get()]
+            while len(batch) < self.max_jobs:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self.run_batch(batch)
+
+    def run_batch(self, batch):
+        start = time.time()
+        results = []
+        try:
+            with transaction.atomic():
+                for func, args, future in batch:
+                    # A savepoint per job: one failing job doesn't roll back the others
+                    try:
+                        with transaction.atomic():
+                            results.append((future, func(*args), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            self.failed += len(batch)
+            if isinstance(e, OperationalError):
+                connection.close_if_unusable_or_obsolete()
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        # Results are only handed out once they are committed
+        self.transactions += 1
+        self.commit_times.append(time.time() - start)
+        for future, result, error in results:
+            if error is None:
+                self.jobs_done += 1
+                future.set_result(result)
+            else:
+                self.failed += 1
+                future.set_exception(error)
+
+    def get_stats(self):
+        return {
+            'queue_depth': self.jobs.qsize(),
+            'transactions': self.transactions,
+            'jobs': self.jobs_done,
+            'failed': self.failed,
+            'avg_commit_time': round(sum(self.commit_times) / len(self.commit_times) * 1000, 2) if self.commit_times else 0,  # ms
+        }
+
+
+db_writer = DatabaseWriter(max_jobs_per_transaction=settings.DB_WRITER_BATCH)
+
+metrics.registry.gauge(
+    'rtsp_db_writer_queue_depth', 'Jobs waiting for the database writer thread', collect=lambda: {(): db_writer.jobs.qsize()},
+)
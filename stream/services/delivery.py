@@ -0,0 +1,43 @@
+import asyncio
+
+
+class LatestFrameSlot:
+    # Single-slot outbox per viewer: a new frame replaces one the client hasn't taken yet
+    def __init__(self):
+        self.frame = None
+        self.event = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+        self.delivered = 0
+
+    def put(self, data):
+        # Returns True when an undelivered frame was replaced
+        replaced = self.frame is not None
+        if replaced:
+            self.dropped += 1
+        self.frame = data
+        self.event.set()
+        return replaced
+
+    async def get(self):
+        while self.frame is None and not self.closed:
+            self.event.clear()
+            await self.event.wait()
+        data, self.frame = self.frame, None
+        if data is not None:
+            self.delivered += 1
+        return data
+
+    def close(self):
+        self.closed = True
+        self.event.set()
+
+    def depth(self):
+        return 0 if self.frame is None else 1
+
+    def get_stats(self):
+        return {
+            'dropped_frames': self.dropped,
+            'delivered_frames': self.delivered,
+            'queue_depth': self.depth(),
+        }
@@ -0,0 +1,311 @@
+import atexit
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+# Nothing in this module may import Django: worker processes are spawned fresh
+# and only need numpy, OpenCV and the detector backends.
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(shm_name, slot_size, model_dir, warm_backend, task_queue, result_conn):
+    from stream.services.backends import create_backend
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        try:
+            # Backends are built on first use so one pool can serve every backend
+            backends = {warm_backend: create_backend(warm_backend, model_dir)}
+            backends[warm_backend].detect(np.zeros((480, 640, 3), dtype=np.uint8))  # warm-up
+        except Exception as e:
+            # Sent as text: not every model library's exceptions survive pickling
+            result_conn.send(('failed', f"{type(e).__name__}: {e}"))
+            return
+        result_conn.send(('ready', None))
+
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            job_id, backend_name, layout = task
+            try:
+                backend = backends.get(backend_name)
+                if backend is None:
+                    backend = backends[backend_name] = create_backend(backend_name, model_dir)
+                frames = [
+                    np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf, offset=slot * slot_size)
+                    for slot, height, width in layout
+                ]
+                # One list of compact (x, y, w, h, confidence) tuples per frame
+                result_conn.send((job_id, backend.detect_batch(frames)))
+            except Exception as e:
+                result_conn.send((job_id, e))
+    finally:
+        shm.close()
+        result_conn.close()
+
+
+class Job:
+    # One batch of frames, sent to a single worker
+    __slots__ = ('future', 'slots', 'worker', 'deadline')
+
+    def __init__(self, future, slots, worker, deadline):
+        self.future = future
+        self.slots = slots
+        self.worker = worker
+        self.deadline = deadline
+
+
+class DetectionPool:
+    # Runs face detection in worker processes; frames travel through a shared-memory ring.
+    # Each worker has its own task queue and result pipe, so the jobs lost with a dead or hung
+    # worker are known and killing it can't corrupt a channel the other workers share:
+    # the pool fails those jobs, returns their slots and starts a replacement worker.
+    def __init__(self, num_workers, model_dir=None, warm_backend='mtcnn', slots=None, slot_size=640 * 480 * 3,
+                 job_timeout=10):
+        self.num_workers = num_workers
+        self.model_dir = model_dir
+        self.warm_backend = warm_backend
+        self.slots = slots or num_workers * 2
+        self.slot_size = slot_size
+        self.job_timeout = job_timeout
+        self.ctx = multiprocessing.get_context('spawn')
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slots * slot_size)
+        # A batch takes all its slots at once, so two half-placed batches can't wait on each other
+        self.free_slots = list(range(self.slots))
+        self.slots_freed = threading.Condition()
+        self.lock = threading.Lock()
+        self.pending = {}  # job id -> Job
+        self.job_ids = itertools.count()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.load_error = None
+        self.restarts = 0
+        self.checked_at = 0
+        self.closed = False
+
+        self.workers = [None] * num_workers
+        self.task_queues = [None] * num_workers
+        self.result_conns = [None] * num_workers
+        self.worker_state = ['starting'] * num_workers  # starting / ready / failed
+        self.in_flight = [0] * num_workers
+        for index in range(num_workers):
+            self.start_worker(index)
+
+        self.result_thread = threading.Thread(target=self._collect_results, daemon=True)
+        self.result_thread.start()
+        atexit.register(self.close)
+
+    def start_worker(self, index):
+        # Fresh channels, so tasks meant for a dead worker can't reach its replacement
+        if self.result_conns[index] is not None:
+            self.result_conns[index].close()
+        reader, writer = self.ctx.Pipe(duplex=False)
+        self.task_queues[index] = self.ctx.Queue()
+        self.result_conns[index] = reader
+        self.worker_state[index] = 'starting'
+        self.in_flight[index] = 0
+        worker = self.workers[index] = self.ctx.Process(
+            target=_worker_main,
+            args=(self.shm.name, self.slot_size, self.model_dir, self.warm_backend, self.task_queues[index], writer),
+            daemon=True,
+        )
+        worker.start()
+        # Only the worker holds the write end now, so its exit shows up as EOF here
+        writer.close()
+
+    def _collect_results(self):
+        # Also the watchdog: checks worker health every half second between results
+        while not self.stopped.is_set():
+            with self.lock:
+                conns = {conn: index for index, conn in enumerate(self.result_conns) if conn is not None}
+            for conn in connection.wait(list(conns), timeout=0.5):
+                self.drain(conns[conn], conn)
+            if time.monotonic() - self.checked_at >= 0.5:
+                self.check_workers()
+
+    def drain(self, index, conn):
+        # Everything already sent, so a worker's last words ("failed") are read before its exit is noticed
+        try:
+            while True:
+                job_id, result = conn.recv()
+                if job_id in ('ready', 'failed'):
+                    self.worker_started(index, job_id, result)
+                else:
+                    self.finish(job_id, result)
+                if not conn.poll():
+                    return
+        except (EOFError, OSError):
+            # The worker exited; check_workers restarts it
+            with self.lock:
+                if self.result_conns[index] is conn:
+                    self.result_conns[index] = None
+                    conn.close()
+
+    def worker_started(self, index, state, error):
+        with self.lock:
+            self.worker_state[index] = state
+            if error:
+                self.load_error = error
+                logger.error("❌ Detection worker %d could not load '%s': %s", index, self.warm_backend, error)
+            if 'starting' not in self.worker_state:
+                self.ready.set()
+
+    def finish(self, job_id, result):
+        with self.lock:
+            job = self.pending.pop(job_id, None)
+            if job is None:
+                # Already failed by check_workers, which returned the slot
+                return
+            self.release(job)
+        if isinstance(result, Exception):
+            job.future.set_exception(result)
+        else:
+            job.future.set_result(result)
+
+    def release(self, job):
+        with self.slots_freed:
+            self.free_slots.extend(job.slots)
+            self.slots_freed.notify_all()
+        self.in_flight[job.worker] -= 1
+
+    def acquire_slots(self, count, timeout):
+        # Waits while the slots are in flight, which throttles producers to pool speed
+        deadline = time.monotonic() + timeout
+        with self.slots_freed:
+            while len(self.free_slots) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No free detection slots within {timeout}s")
+                self.slots_freed.wait(remaining)
+            slots = self.free_slots[-count:]
+            del self.free_slots[-count:]
+        return slots
+
+    def check_workers(self):
+        now_time = self.checked_at = time.monotonic()
+        failed = []
+        with self.lock:
+            if self.closed:
+                return
+            dead = {
+                index for index, worker in enumerate(self.workers)
+                if self.worker_state[index] != 'failed' and not worker.is_alive()
+            }
+            # A ready worker sitting on an overdue job is stuck; one still loading is only slow
+            hung = {
+                job.worker for job in self.pending.values()
+                if job.deadline < now_time and self.worker_state[job.worker] == 'ready'
+            } - dead
+            for index in hung:
+                self.workers[index].kill()  # SIGKILL: a stopped or wedged process ignores SIGTERM
+
+            for job_id, job in list(self.pending.items()):
+                if job.worker in dead:
+                    error = RuntimeError(f"Detection worker {job.worker} died")
+                elif job.worker in hung:
+                    error = TimeoutError(f"Detection worker {job.worker} stopped responding")
+                elif job.deadline < now_time:
+                    error = TimeoutError(f"Detection took longer than {self.job_timeout}s")
+                else:
+                    continue
+                del self.pending[job_id]
+                self.release(job)
+                failed.append((job.future, error))
+
+            for index in dead | hung:
+                self.workers[index].join(timeout=1)
+                logger.warning("🔁 Detection worker %d %s, starting a new one", index, 'hung' if index in hung else 'died')
+                self.restarts += 1
+                self.start_worker(index)
+
+        for future, error in failed:
+            future.set_exception(error)
+
+    def pick_worker(self):
+        # Least busy ready worker; one still loading only when none is ready
+        for states in (('ready',), ('starting',)):
+            candidates = [index for index, state in enumerate(self.worker_state) if state in states]
+            if candidates:
+                return min(candidates, key=lambda index: self.in_flight[index])
+        return None
+
+    def check_frame(self, frame):
+        if frame.nbytes > self.slot_size:
+            raise ValueError(f"Frame of {frame.nbytes} bytes does not fit a {self.slot_size} byte slot")
+
+    def submit(self, frames, backend='mtcnn', timeout=None):
+        # The whole batch goes to one worker, which runs the backend's detect_batch on it
+        for frame in frames:
+            self.check_frame(frame)
+        if len(frames) > self.slots:
+            raise ValueError(f"Batch of {len(frames)} frames is larger than the pool's {self.slots} slots")
+        timeout = self.job_timeout if timeout is None else timeout
+
+        slots = self.acquire_slots(len(frames), timeout)
+        layout = []
+        for slot, frame in zip(slots, frames):
+            height, width = frame.shape[:2]
+            target = np.ndarray((height, width, 3), dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_size)
+            np.copyto(target, frame)
+            layout.append((slot, height, width))
+
+        future = Future()
+        with self.lock:
+            worker = self.pick_worker()
+            if worker is None:
+                with self.slots_freed:
+                    self.free_slots.extend(slots)
+                    self.slots_freed.notify_all()
+                raise RuntimeError(f"No detection worker is running ({self.load_error})")
+            job_id = next(self.job_ids)
+            self.pending[job_id] = Job(future, slots, worker, time.monotonic() + timeout)
+            self.in_flight[worker] += 1
+            self.task_queues[worker].put((job_id, backend, layout))
+        return future
+
+    def detect(self, frame, backend='mtcnn', timeout=None):
+        timeout = self.job_timeout if timeout is None else timeout
+        # check_workers fails the job at its deadline; the extra second only covers its polling
+        return self.submit([frame], backend, timeout).result(timeout=timeout + 1)[0]
+
+    def wait_ready(self, timeout=None):
+        # False when the workers didn't come up in time or a worker couldn't load the model
+        return self.ready.wait(timeout) and self.load_error is None
+
+    def get_stats(self):
+        return {
+            'workers': self.worker_state.count('ready'),
+            'restarts': self.restarts,
+            'pending': len(self.pending),
+            'free_slots': len(self.free_slots),
+        }
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.stopped.set()
+        self.result_thread.join(timeout=5)
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.kill()
+        for conn in self.result_conns:
+            if conn is not None:
+                conn.close()
+        for job in self.pending.values():
+            job.future.set_exception(RuntimeError("Detection pool closed"))
+        self.pending.clear()
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,126 @@
+import logging
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from stream.services.backends import create_backend
+from stream.services.detection_pool import DetectionPool
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss_mb():
+    # Resident set size from /proc, falls back to peak RSS where /proc is missing
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class FaceDetector:
+    def __init__(self, backend='mtcnn', confidence_threshold=0.3, pool=None):  # Lower threshold for testing
+        self.backend_name = backend
+        # With a pool, inference happens in worker processes and no model is loaded here
+        self.pool = pool
+        self.backend = None if pool else create_backend(backend, settings.FACE_MODELS_DIR)
+        self.confidence_threshold = confidence_threshold
+        # Model state (TensorFlow, cv2.dnn nets) is not safe to drive from several threads at once
+        self.lock = threading.Lock()
+
+    def detect_faces(self, frame_bgr):
+        return self.detect_faces_batch([frame_bgr])[0]
+
+    def check_frame(self, frame_bgr):
+        # Raises ValueError for a frame the worker pool can't take, before it joins a batch
+        if self.pool:
+            self.pool.check_frame(frame_bgr)
+
+    def detect_faces_batch(self, frames_bgr):
+        if self.pool:
+            # The whole batch runs as one detect_batch call in one worker process
+            future = self.pool.submit(frames_bgr, self.backend_name)
+            batch = future.result(timeout=self.pool.job_timeout + 1)
+        else:
+            with self.lock:
+                batch = self.backend.detect_batch(frames_bgr)
+
+        results = []
+        for faces in batch:
+            detections = [{'box': [x, y, w, h], 'confidence': confidence} for x, y, w, h, confidence in faces]
+            filtered = [det for det in detections if det['confidence'] >= self.confidence_threshold]
+            # Formatted only when DEBUG is on for this module
+            logger.debug("%s: %d raw detection(s), kept %s", self.backend_name, len(detections), filtered)
+            results.append(filtered)
+        return results
+
+
+class DetectorRegistry:
+    # Loads each backend's model once per process and hands the same instance to every consumer
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.detectors = {}
+        self.pool = None
+        self.stats = {}
+
+    def get(self, backend=None):
+        backend = backend or settings.DEFAULT_DETECTOR_BACKEND
+        detector = self.detectors.get(backend)
+        if detector is None:
+            with self.lock:
+                detector = self.detectors.get(backend)
+                if detector is None:
+                    detector = self.detectors[backend] = self.load(backend)
+        return detector
+
+    def load(self, backend):
+        rss_before = current_rss_mb()
+        load_start = time.time()
+        workers = getattr(settings, 'DETECTION_WORKERS', 0)
+        if workers > 0 and self.pool is None:
+            self.pool = DetectionPool(
+                workers,
+                model_dir=settings.FACE_MODELS_DIR,
+                warm_backend=backend,
+                # Room for every worker to hold a full batch
+                slots=workers * max(settings.DETECTION_BATCH_SIZE, 2),
+                slot_size=settings.DETECTION_MAX_FRAME_BYTES,
+            )
+            if not self.pool.wait_ready(timeout=120):
+                error = self.pool.load_error or "workers did not start within 120s"
+                self.pool.close()
+                self.pool = None
+                raise RuntimeError(f"Detection pool for '{backend}' failed to start: {error}")
+        detector = FaceDetector(backend=backend, confidence_threshold=0.3, pool=self.pool)
+        load_time = time.time() - load_start
+
+        # Warm-up inference so the first real frame doesn't pay for graph tracing
+        warmup_start = time.time()
+        detector.detect_faces(np.zeros((480, 640, 3), dtype=np.uint8))
+        warmup_time = time.time() - warmup_start
+
+        rss_after = current_rss_mb()
+        self.stats[backend] = {
+            'load_time': round(load_time * 1000, 2),      # ms
+            'warmup_time': round(warmup_time * 1000, 2),  # ms
+            'rss_before_mb': round(rss_before, 1),
+            'rss_after_mb': round(rss_after, 1),
+            'model_rss_mb': round(rss_after - rss_before, 1),
+            'workers': workers,
+        }
+        logger.info("🧠 Face detector '%s' loaded: %s", backend, self.stats[backend])
+        return detector
+
+    def preload(self, backend=None):
+        self.get(backend)
+
+    def get_stats(self):
+        return {backend: dict(stats) for backend, stats in self.stats.items()}
+
+
+detector_registry = DetectorRegistry()
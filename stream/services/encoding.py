@@ -0,0 +1,128 @@
+import math
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+def positive_number(value):
+    # Viewer hints come straight from the client; anything but a finite number above zero is ignored
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) and value > 0 else None
+
+
+class AdaptiveEncoder:
+    # Quality ladder from best to cheapest: (JPEG quality, scale, max fps)
+    LADDER = [
+        (85, 1.0, 15),
+        (75, 1.0, 15),
+        (65, 1.0, 12),
+        (60, 0.75, 12),
+        (50, 0.75, 10),
+        (45, 0.5, 8),
+        (40, 0.5, 5),
+    ]
+
+    def __init__(self, target_latency=0.2, max_width=None, max_fps=None, adjust_interval=2.0):
+        self.target_latency = target_latency  # seconds, per-frame send/ack latency we aim for
+        self.max_width = max_width
+        self.max_fps = max_fps
+        self.adjust_interval = adjust_interval
+        self.level = 0
+        self.latency = None  # EWMA of send duration or ack round trip
+        self.sent_times = deque(maxlen=64)  # send timestamps still awaiting a client ack
+        self.last_adjust_time = time.time()
+        self.last_dropped = 0
+        self.last_send_time = 0
+        self.bytes_sent = 0
+        self.frames_sent = 0
+
+    def apply_hints(self, max_width=None, max_fps=None, target_latency_ms=None):
+        max_width = positive_number(max_width)
+        if max_width and max_width >= 1:
+            self.max_width = int(max_width)
+        max_fps = positive_number(max_fps)
+        if max_fps:
+            self.max_fps = max_fps
+        target_latency_ms = positive_number(target_latency_ms)
+        if target_latency_ms:
+            self.target_latency = target_latency_ms / 1000
+
+    def current(self):
+        quality, scale, fps = self.LADDER[self.level]
+        if self.max_fps:
+            fps = min(fps, self.max_fps)
+        return quality, scale, fps
+
+    def should_send(self, now_time):
+        _, _, fps = self.current()
+        if now_time - self.last_send_time < 1 / fps:
+            return False
+        self.last_send_time = now_time
+        return True
+
+    def encode(self, frame):
+        quality, scale, _ = self.current()
+        height, width = frame.shape[:2]
+        if self.max_width and width * scale > self.max_width:
+            scale = self.max_width / width
+        if scale < 1.0:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes() if success else None
+
+    def transcode(self, data, width, quality):
+        # Frames published by the detection supervisor are already JPEG: forward them untouched
+        # unless this viewer's level or max_width asks for a smaller or cheaper frame
+        target_quality, scale, _ = self.current()
+        if target_quality >= quality and scale >= 1.0 and not (self.max_width and width > self.max_width):
+            return data
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        return self.encode(frame)
+
+    def record_latency(self, sample):
+        self.latency = sample if self.latency is None else 0.8 * self.latency + 0.2 * sample
+
+    def on_sent(self, size, send_duration):
+        self.bytes_sent += size
+        self.frames_sent += 1
+        self.sent_times.append(time.time())
+        self.record_latency(send_duration)
+
+    def on_ack(self):
+        # Clients that ack each rendered frame give us a real round trip instead of send duration
+        if self.sent_times:
+            self.record_latency(time.time() - self.sent_times.popleft())
+
+    def adjust(self, dropped_total):
+        now_time = time.time()
+        if now_time - self.last_adjust_time < self.adjust_interval:
+            return
+        self.last_adjust_time = now_time
+        new_drops = dropped_total - self.last_dropped
+        self.last_dropped = dropped_total
+        latency = self.latency or 0
+
+        if (new_drops > 0 or latency > self.target_latency) and self.level < len(self.LADDER) - 1:
+            self.level += 1
+        elif new_drops == 0 and latency < self.target_latency / 2 and self.level > 0:
+            self.level -= 1
+
+    def get_stats(self):
+        quality, scale, fps = self.current()
+        return {
+            'level': self.level,
+            'jpeg_quality': quality,
+            'scale': scale,
+            'max_width': self.max_width,
+            'target_fps': fps,
+            'latency': round((self.latency or 0) * 1000, 2),  # ms
+            'frames_sent': self.frames_sent,
+            'bytes_sent': self.bytes_sent,
+        }
@@ -0,0 +1,94 @@
+import logging
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+class FrameReader:
+    # Dedicated thread that readinto()s ffmpeg's raw output over a ring of preallocated frames.
+    # on_frame(frame, read_time) and on_eof() are called on the event loop.
+    def __init__(self, stream, width, height, loop, on_frame, on_eof, ring_size=8, log=None):
+        self.stream = stream
+        self.log = log or logging.getLogger(__name__)
+        self.shape = (height, width, 3)
+        self.frame_size = width * height * 3
+        self.loop = loop
+        self.on_frame = on_frame
+        self.on_eof = on_eof
+        self.ring = [np.empty(self.shape, dtype=np.uint8) for _ in range(ring_size)]
+        self.views = [memoryview(buf).cast('B') for buf in self.ring]
+        # Slots handed to the loop but not yet published; their refcount can't be trusted yet
+        self.in_flight = set()
+        self.index = 0
+        self.frames_read = 0
+        self.ring_grows = 0
+        self.running = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def next_free_slot(self):
+        # A slot is free once nobody outside the ring holds the array (or a view of it):
+        # refcount 3 = self.ring entry + memoryview export + getrefcount's own argument
+        for _ in range(len(self.ring)):
+            slot = self.index
+            self.index = (self.index + 1) % len(self.ring)
+            if slot not in self.in_flight and sys.getrefcount(self.ring[slot]) <= 3:
+                return slot
+        # Every slot is still held by a slow consumer; grow once rather than overwrite it
+        self.ring.append(np.empty(self.shape, dtype=np.uint8))
+        self.views.append(memoryview(self.ring[-1]).cast('B'))
+        self.ring_grows += 1
+        return len(self.ring) - 1
+
+    def read_into(self, view):
+        got = 0
+        while got < self.frame_size:
+            n = self.stream.readinto(view[got:])
+            if not n:
+                return got
+            got += n
+        return got
+
+    def run(self):
+        try:
+            while self.running:
+                slot = self.next_free_slot()
+                read_start = time.perf_counter()
+                got = self.read_into(self.views[slot])
+                read_time = time.perf_counter() - read_start
+                if got < self.frame_size:
+                    self.log.info("🚫 No frame or incomplete frame: got %d bytes, expected %d", got, self.frame_size)
+                    break
+                self.frames_read += 1
+                self.in_flight.add(slot)
+                self.loop.call_soon_threadsafe(self.publish, slot, read_time)
+        except (ValueError, OSError) as e:
+            # Pipe closed underneath us while stopping
+            self.log.warning("⚠️ Frame reader stopped: %s", e)
+        finally:
+            self.running = False
+            try:
+                self.loop.call_soon_threadsafe(self.on_eof)
+            except RuntimeError:
+                pass  # event loop already closed during shutdown
+
+    def publish(self, slot, read_time):
+        frame = self.ring[slot].view()
+        frame.flags.writeable = False  # shared by every subscriber
+        self.on_frame(frame, read_time)
+        self.in_flight.discard(slot)
+
+    def get_stats(self):
+        return {
+            'frames_read': self.frames_read,
+            'ring_size': len(self.ring),
+            'ring_grows': self.ring_grows,
+        }
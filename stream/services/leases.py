@@ -0,0 +1,95 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+
+# Renew/release only while we still hold the lease, so a node that lost it can't clobber the new owner
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def stream_lease_key(stream_id):
+    return f"rtsp:lease:stream:{stream_id}"
+
+
+def default_node_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class RedisLeaseStore:
+    # Camera ownership across nodes: SET NX PX to claim, compare-and-expire to renew
+    def __init__(self, url):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.renew_script = self.redis.register_script(RENEW_SCRIPT)
+        self.release_script = self.redis.register_script(RELEASE_SCRIPT)
+
+    async def acquire(self, key, owner, ttl):
+        if await self.redis.set(key, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        # Already ours (e.g. a restarted worker on the same node): just extend it
+        return await self.renew(key, owner, ttl)
+
+    async def renew(self, key, owner, ttl):
+        return bool(await self.renew_script(keys=[key], args=[owner, int(ttl * 1000)]))
+
+    async def release(self, key, owner):
+        await self.release_script(keys=[key], args=[owner])
+
+    async def owner(self, key):
+        return await self.redis.get(key)
+
+
+class InMemoryLeaseStore:
+    # Same contract inside one process, for the in-memory channel layer and local testing
+    # (no awaits inside the methods, so each one is atomic on the event loop)
+    def __init__(self):
+        self.leases = {}
+
+    def current(self, key):
+        lease = self.leases.get(key)
+        if lease and lease[1] > time.monotonic():
+            return lease[0]
+        return None
+
+    async def acquire(self, key, owner, ttl):
+        if self.current(key) not in (None, owner):
+            return False
+        self.leases[key] = (owner, time.monotonic() + ttl)
+        return True
+
+    async def renew(self, key, owner, ttl):
+        if self.current(key) != owner:
+            return False
+        self.leases[key] = (owner, time.monotonic() + ttl)
+        return True
+
+    async def release(self, key, owner):
+        if self.current(key) == owner:
+            del self.leases[key]
+
+    async def owner(self, key):
+        return self.current(key)
+
+
+in_memory_leases = InMemoryLeaseStore()
+
+
+def get_lease_store():
+    # Leases live next to the channel layer: Redis when the layer is Redis, process memory otherwise
+    backend = settings.CHANNEL_LAYERS['default']['BACKEND']
+    if backend.startswith('channels_redis'):
+        return RedisLeaseStore(settings.REDIS_URL)
+    return in_memory_leases
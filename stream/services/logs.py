@@ -0,0 +1,116 @@
+import atexit
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from stream.services import metrics
+
+# Per-stream loggers live under this name (stream.pipeline.<label>), so each stream's level can be
+# changed on its own while records still propagate to the one queue handler on "stream"
+PIPELINE_LOGGER = 'stream.pipeline'
+
+discarded = {'queue_full': 0, 'rate_limited': 0}
+
+# ffmpeg stderr lines are counted by kind instead of printed one by one
+FFMPEG_PATTERNS = (
+    ('connection', re.compile(
+        r'connection (refused|timed out|reset)|network is unreachable|no route to host|'
+        r'server returned|method \w+ failed|could not find codec|end of file', re.I,
+    )),
+    ('packet_loss', re.compile(r'missed \d+ packets|max delay reached|packets? (lost|dropped)|rtp', re.I)),
+    ('decode', re.compile(
+        r'error while decoding|non-existing pps|decode_slice_header|concealing|invalid data found|corrupt|'
+        r'left block unavailable|bytestream', re.I,
+    )),
+    ('timestamp', re.compile(r'\b[dp]ts\b|non-monotonous|past duration|timestamp', re.I)),
+)
+# Kinds that are routine on lossy networks and only shown at DEBUG
+NOISY_FFMPEG_KINDS = {'packet_loss', 'decode', 'timestamp'}
+
+
+def stream_logger(label):
+    # Dots would nest loggers ("10.0.0.5" -> 10 / 0 / 0 / 5), so keep the label a single name part
+    name = f"{PIPELINE_LOGGER}.{str(label).replace('.', '_')}"
+    return logging.LoggerAdapter(logging.getLogger(name), {'stream': label})
+
+
+def set_stream_log_level(label, level):
+    # level is a name like "DEBUG", or None to fall back to the "stream" logger's level
+    stream_logger(label).logger.setLevel(level.upper() if level else logging.NOTSET)
+
+
+def classify_ffmpeg_line(line):
+    for kind, pattern in FFMPEG_PATTERNS:
+        if pattern.search(line):
+            return kind
+    return 'other'
+
+
+class StreamFormatter(logging.Formatter):
+    # Records from per-stream loggers carry their stream; everything else shows "-"
+    def format(self, record):
+        if not hasattr(record, 'stream'):
+            record.stream = '-'
+        return super().format(record)
+
+
+class RateLimitFilter(logging.Filter):
+    # At most `burst` records per logger and message template every `interval` seconds. The rest
+    # are dropped before they are formatted or queued, and counted on the next record that gets through.
+    def __init__(self, burst=5, interval=10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.windows = {}  # (logger name, template) -> [window start, passed, suppressed]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.burst:
+            return True
+        key = (record.name, record.msg)
+        now_time = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now_time - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                if len(self.windows) > 10000:
+                    self.windows.clear()  # keys are templates, so only a runaway caller gets here
+                self.windows[key] = [now_time, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                discarded['rate_limited'] += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.getMessage()} (+{suppressed} similar suppressed)"
+            record.args = None
+        return True
+
+
+class AsyncLogHandler(QueueHandler):
+    # Callers only format and enqueue; one listener thread writes to stdout. When the queue is
+    # full the record is dropped rather than blocking the event loop on a slow log collector.
+    def __init__(self, max_queue=10000):
+        super().__init__(queue.Queue(max_queue))
+        output = logging.StreamHandler(sys.stdout)
+        self.listener = QueueListener(self.queue, output)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            discarded['queue_full'] += 1
+
+
+metrics.registry.gauge(
+    'rtsp_log_records_discarded', 'Log records dropped by the rate limiter or a full log queue', ('reason',),
+    collect=lambda: {(reason,): count for reason, count in discarded.items()},
+)
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import math
+from bisect import bisect_left
+from urllib.parse import urlsplit
+
+# Prometheus text exposition without a client library: every metric is updated from the event
+# loop thread only (plain int/float adds, no locks), and rendered on the same loop when scraped.
+
+# Seconds; covers a 1 ms encode up to a multi-second detector stall
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+
+def stream_label(stream_id=None, rtsp_url=None):
+    # Streams are labelled by id; ad-hoc viewers by camera address, never with its credentials
+    if stream_id:
+        return str(stream_id)
+    if not rtsp_url:
+        return 'unknown'
+    parts = urlsplit(rtsp_url)
+    host = parts.hostname or ''
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return f"{host}{parts.path}"
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class CounterSeries:
+    __slots__ = ('value', 'labels')
+
+    def __init__(self, labels):
+        self.value = 0
+        self.labels = labels  # formatted once, scrapes only join strings
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class GaugeSeries(CounterSeries):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class HistogramSeries:
+    __slots__ = ('bounds', 'counts', 'sum', 'labels', 'bucket_labels')
+
+    def __init__(self, bounds, labels, bucket_labels):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.labels = labels
+        self.bucket_labels = bucket_labels
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    kind = None
+    series_class = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+
+    def labels(self, *values):
+        # Callers on the hot path keep the returned series and update it directly
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = self.new_series(values)
+        return series
+
+    def new_series(self, values):
+        return self.series_class(format_labels(self.labelnames, values))
+
+    def samples(self):
+        for series in list(self.series.values()):
+            yield self.name, series.labels, series.value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {format_value(value)}" for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+    series_class = CounterSeries
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+    series_class = GaugeSeries
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        # Optional callable returning {label values: value}, read at scrape time instead of tracked
+        self.collect = collect
+
+    def samples(self):
+        if self.collect is None:
+            yield from super().samples()
+            return
+        for values, value in self.collect().items():
+            yield self.name, format_labels(self.labelnames, values), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(buckets)
+
+    def new_series(self, values):
+        bucket_labels = [
+            format_labels(self.labelnames, values, f'le="{format_value(bound)}"') for bound in self.bounds + (math.inf,)
+        ]
+        return HistogramSeries(self.bounds, format_labels(self.labelnames, values), bucket_labels)
+
+    def samples(self):
+        bucket_name, sum_name, count_name = f"{self.name}_bucket", f"{self.name}_sum", f"{self.name}_count"
+        for series in list(self.series.values()):
+            cumulative = 0
+            for labels, count in zip(series.bucket_labels, list(series.counts)):
+                cumulative += count
+                yield bucket_name, labels, cumulative
+            yield sum_name, series.labels, series.sum
+            yield count_name, series.labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), collect=None):
+        return self.register(Gauge(name, documentation, labelnames, collect))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning("⚠️ Failed to collect metric %s: %s", metric.name, e)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    'rtsp_stage_seconds', 'Time per frame spent in each pipeline stage (read, detect, encode, send, persist)',
+    ('stream', 'stage'),
+)
+frames_total = registry.counter('rtsp_frames_total', 'Frames processed by detection pipelines', ('stream',))
+frames_dropped = registry.counter(
+    'rtsp_frames_dropped_total', 'Frames or detections dropped (ingest queue, viewer outbox, persistence queue)',
+    ('stream', 'where'),
+)
+ingest_restarts = registry.counter('rtsp_ingest_restarts_total', 'ffmpeg restarts', ('stream',))
+ffmpeg_messages = registry.counter(
+    'rtsp_ffmpeg_messages_total', 'ffmpeg stderr lines by kind (connection, packet_loss, decode, timestamp, other)',
+    ('stream', 'kind'),
+)
+viewers = registry.gauge('rtsp_viewers', 'Connected WebSocket viewers', ('stream',))
+
+
+async def handle_scrape(reader, writer):
+    # Bare HTTP for processes without Django's server in front (manage.py run_detectors)
+    try:
+        await reader.readuntil(b'\r\n\r\n')
+        body = registry.render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(port, host='0.0.0.0'):
+    server = await asyncio.start_server(handle_scrape, host, port)
+    logger.info("📈 Metrics on http://%s:%d/metrics", host, port)
+    return server
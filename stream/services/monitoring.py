@@ -0,0 +1,168 @@
+import math
+import time
+
+# Latency histogram layout: log-spaced buckets ~4% wide from 10 µs up to ~100 s, so a
+# percentile is exact to within a bucket and memory is fixed however many samples arrive
+HISTOGRAM_MIN = 1e-5
+HISTOGRAM_GROWTH = 1.04
+HISTOGRAM_BUCKETS = math.ceil(math.log(1e7) / math.log(HISTOGRAM_GROWTH)) + 2
+LOG_GROWTH = math.log(HISTOGRAM_GROWTH)
+
+FPS_WINDOWS = (1, 10, 60)  # seconds
+PERCENTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+
+class RateWindow:
+    # Events per second over the last N seconds from a ring of one-second buckets:
+    # O(1) to record, O(window) to read, nothing stored per event
+    def __init__(self, seconds=60):
+        self.size = seconds + 1  # + the second in progress
+        self.counts = [0] * self.size
+        self.seconds = [-1] * self.size  # which second each bucket currently holds
+        self.started = time.monotonic()
+
+    def add(self, now_time, count=1):
+        second = int(now_time)
+        index = second % self.size
+        if self.seconds[index] != second:
+            self.seconds[index] = second
+            self.counts[index] = 0
+        self.counts[index] += count
+
+    def rate(self, window, now_time):
+        # Whole seconds only; the one in progress would read low
+        current = int(now_time)
+        first = current - min(window, self.size - 1)
+        total = 0
+        for second in range(max(first, int(self.started)), current):
+            index = second % self.size
+            if self.seconds[index] == second:
+                total += self.counts[index]
+        # A window reaching back before we started only covers the time since then
+        span = current - max(first, self.started)
+        return total / span if span > 0 else 0.0
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        if value <= HISTOGRAM_MIN:
+            index = 0
+        else:
+            index = min(HISTOGRAM_BUCKETS - 1, int(math.log(value / HISTOGRAM_MIN) / LOG_GROWTH) + 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in enumerate(other.buckets):
+            if count:
+                self.buckets[index] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                # Upper edge of the bucket, never above the largest value actually seen
+                return min(HISTOGRAM_MIN * HISTOGRAM_GROWTH ** index, self.max)
+        return self.max
+
+    def get_stats(self):
+        stats = {name: round(self.percentile(fraction) * 1000, 2) for name, fraction in PERCENTILES}  # ms
+        stats['max'] = round(self.max * 1000, 2)
+        stats['count'] = self.count
+        return stats
+
+
+class StageLatency:
+    # Two histograms, swapped every window / 2 seconds: percentiles always cover the last
+    # window / 2 to window seconds, in fixed memory
+    def __init__(self, window=60):
+        self.half_window = window / 2
+        self.current = LatencyHistogram()
+        self.previous = LatencyHistogram()
+        self.rotated_at = time.monotonic()
+
+    def rotate(self, now_time):
+        if now_time - self.rotated_at >= self.half_window:
+            # Idle for a whole window: nothing recent is left in either half
+            self.previous = self.current if now_time - self.rotated_at < 2 * self.half_window else LatencyHistogram()
+            self.current = LatencyHistogram()
+            self.rotated_at = now_time
+
+    def add(self, value, now_time):
+        self.rotate(now_time)
+        self.current.add(value)
+
+    def window(self, now_time):
+        self.rotate(now_time)
+        merged = LatencyHistogram()
+        merged.merge(self.previous)
+        merged.merge(self.current)
+        return merged
+
+
+class PerformanceMonitor:
+    # Frame rate over 1 s / 10 s / 60 s and per-stage latency percentiles over the last minute.
+    # Give several streams' monitors the same parent to get a combined view.
+    def __init__(self, parent=None, window=60):
+        self.parent = parent
+        self.frames = RateWindow(max(FPS_WINDOWS))
+        self.stages = {stage: StageLatency(window) for stage in ('processing', 'detection', 'tracking')}
+        self.start_time = time.time()
+        self.total_frames = 0
+        self.total_detections = 0
+
+    def add_frame(self, processing_time=None, detection_time=None, tracking_time=None, now_time=None):
+        if now_time is None:
+            now_time = time.monotonic()
+        self.frames.add(now_time)
+        self.total_frames += 1
+        if processing_time is not None:
+            self.stages['processing'].add(processing_time, now_time)
+        if detection_time is not None:
+            self.stages['detection'].add(detection_time, now_time)
+            self.total_detections += 1
+        if tracking_time is not None:
+            self.stages['tracking'].add(tracking_time, now_time)
+        if self.parent is not None:
+            self.parent.add_frame(processing_time, detection_time, tracking_time, now_time)
+
+    def get_stats(self):
+        now_time = time.monotonic()
+        fps = {f'{window}s': round(self.frames.rate(window, now_time), 2) for window in FPS_WINDOWS}
+        latency = {stage: history.window(now_time) for stage, history in self.stages.items()}
+
+        def average(stage):
+            histogram = latency[stage]
+            return round(histogram.sum / histogram.count * 1000, 2) if histogram.count else 0  # ms
+
+        return {
+            'current_fps': fps['10s'],
+            'fps': fps,
+            'avg_processing_time': average('processing'),
+            'avg_detection_time': average('detection'),
+            'avg_tracking_time': average('tracking'),
+            'latency': {stage: histogram.get_stats() for stage, histogram in latency.items()},
+            'total_frames': self.total_frames,
+            'total_detections': self.total_detections,
+            'uptime': round(time.time() - self.start_time, 2)
+        }
+
+
+# Every pipeline in this process also records here
+global_performance = PerformanceMonitor()
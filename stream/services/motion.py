@@ -0,0 +1,47 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    # Cheap frame differencing on a small grayscale copy, run before the face detector
+    def __init__(self, sensitivity=0.02, min_detection_interval=5.0, width=160, height=120, pixel_threshold=25):
+        self.sensitivity = sensitivity  # fraction of pixels that must change
+        self.min_detection_interval = min_detection_interval  # seconds, safety net for slow movers
+        self.size = (width, height)
+        self.pixel_threshold = pixel_threshold
+        self.previous = None
+        self.last_detection_time = 0
+        self.last_motion_score = 0
+        self.frames_checked = 0
+        self.frames_skipped = 0
+
+    def should_detect(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self.previous is None:
+            motion_score = 1.0
+        else:
+            diff = cv2.absdiff(gray, self.previous)
+            motion_score = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+        self.previous = gray
+        self.last_motion_score = motion_score
+        self.frames_checked += 1
+
+        now_time = time.time()
+        if motion_score >= self.sensitivity or now_time - self.last_detection_time >= self.min_detection_interval:
+            self.last_detection_time = now_time
+            return True
+
+        self.frames_skipped += 1
+        return False
+
+    def get_stats(self):
+        return {
+            'frames_checked': self.frames_checked,
+            'frames_skipped': self.frames_skipped,
+            'skip_ratio': round(self.frames_skipped / self.frames_checked, 3) if self.frames_checked else 0,
+            'motion_score': round(self.last_motion_score, 4),
+        }
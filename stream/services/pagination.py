@@ -0,0 +1,75 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, pk):
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidQuery("Invalid cursor")
+
+
+def parse_time(value, name):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise InvalidQuery(f"Invalid {name}: expected an ISO 8601 datetime")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_bool(value, name):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise InvalidQuery(f"Invalid {name}: expected true or false")
+
+
+def parse_number(value, name, cast=float):
+    try:
+        return cast(value)
+    except ValueError:
+        raise InvalidQuery(f"Invalid {name}: expected a number")
+
+
+def filter_by_time(queryset, params, field='timestamp'):
+    # ?since= (inclusive) / ?until= (exclusive) bound the time range
+    if params.get('since'):
+        queryset = queryset.filter(**{f'{field}__gte': parse_time(params['since'], 'since')})
+    if params.get('until'):
+        queryset = queryset.filter(**{f'{field}__lt': parse_time(params['until'], 'until')})
+    return queryset
+
+
+def paginate(queryset, params, fields, field='timestamp'):
+    # Keyset pagination, newest first: the cursor is the (timestamp, id) of the last row served,
+    # so every page is an index range scan no matter how deep it is
+    limit = min(parse_number(params.get('limit', DEFAULT_PAGE_SIZE), 'limit', int), MAX_PAGE_SIZE)
+    if limit < 1:
+        raise InvalidQuery("Invalid limit: must be at least 1")
+    if params.get('cursor'):
+        timestamp, pk = decode_cursor(params['cursor'])
+        queryset = queryset.filter(Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk}))
+    rows = list(queryset.order_by(f'-{field}', '-id').values(*fields)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][field], rows[-1]['id'])
+    return rows, next_cursor
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import cv2
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from stream.models import Alert, Detection, Stream
+from stream.services import metrics
+from stream.services.db_writer import db_writer
+from stream.services.rollups import add_to_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionEvent:
+    def __init__(self, stream_id, frame, box, confidence, timestamp, on_saved=None):
+        self.stream_id = stream_id
+        self.frame = frame  # private copy, the ingest ring reuses its buffers
+        self.box = box
+        self.confidence = confidence
+        self.timestamp = timestamp
+        self.on_saved = on_saved  # async callable receiving the saved Detection
+        self.queued_at = time.time()
+
+
+class DetectionWriter:
+    # Takes detections off the frame loop: snapshots are encoded in memory and written once
+    # through the ImageField's storage, rows go in with bulk_create every flush_interval
+    # through the single database writer
+    def __init__(self, flush_interval=0.5, max_batch=64, max_queue=256, stream_cache_ttl=60):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.queue = deque(maxlen=max_queue)
+        self.wakeup = None
+        self.task = None
+        self.stream_cache_ttl = stream_cache_ttl
+        self.known_streams = {}  # stream_id -> time it was last seen in the database
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.rows_written = 0
+        self.flush_times = deque(maxlen=100)
+        self.max_flush_time = 0
+        self.max_queue_wait = 0
+
+    def submit(self, event):
+        # Never blocks: when the database falls behind, the oldest queued detection is dropped
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+            metrics.frames_dropped.labels(metrics.stream_label(self.queue[0].stream_id), 'persist').inc()
+        self.queue.append(event)
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        if len(self.queue) >= self.max_batch:
+            self.wakeup.set()
+
+    async def run(self):
+        while self.queue:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        while self.queue:
+            batch = [self.queue.popleft() for _ in range(min(self.max_batch, len(self.queue)))]
+            flush_start = time.time()
+            self.max_queue_wait = max(self.max_queue_wait, flush_start - batch[0].queued_at)
+            try:
+                batch = await sync_to_async(self.drop_unknown_streams)(batch)
+                detections = await asyncio.to_thread(self.save_snapshots, batch)
+                try:
+                    await db_writer.run_job(self.insert_batch, detections)
+                except Exception:
+                    await asyncio.to_thread(self.delete_snapshots, detections)
+                    raise
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error("❌ Failed to persist %d detection(s): %s", len(batch), e)
+                continue
+            flush_time = time.time() - flush_start
+            self.flush_times.append(flush_time)
+            self.max_flush_time = max(self.max_flush_time, flush_time)
+            self.batches += 1
+            self.rows_written += len(detections)
+            logger.info("📦 Saved %d detection(s) with alerts in %.1f ms", len(detections), flush_time * 1000)
+
+            # Persist stage: from detection to committed row, queueing included
+            saved_at = time.time()
+            for event in batch:
+                metrics.stage_seconds.labels(metrics.stream_label(event.stream_id), 'persist').observe(saved_at - event.queued_at)
+
+            for event, detection in zip(batch, detections):
+                if event.on_saved:
+                    try:
+                        await event.on_saved(detection)
+                    except Exception as e:
+                        logger.warning("⚠️ Failed to announce detection %s: %s", detection.id, e)
+
+    def drop_unknown_streams(self, batch):
+        # Rows reference streams by id; only ask the database about ids not confirmed recently
+        now_time = time.time()
+        unknown = {
+            event.stream_id for event in batch
+            if now_time - self.known_streams.get(event.stream_id, 0) > self.stream_cache_ttl
+        }
+        if unknown:
+            existing = set(Stream.objects.filter(id__in=unknown).values_list('id', flat=True))
+            for stream_id in unknown:
+                if stream_id in existing:
+                    self.known_streams[stream_id] = now_time
+                else:
+                    self.known_streams.pop(stream_id, None)
+        kept = [event for event in batch if event.stream_id in self.known_streams]
+        if len(kept) < len(batch):
+            logger.warning("⚠️ Dropped %d detection(s) for deleted streams", len(batch) - len(kept))
+        return kept
+
+    def save_snapshots(self, batch):
+        # Disk work stays off the writer thread so it never holds a transaction open
+        detections = []
+        for event in batch:
+            x, y, w, h = event.box
+            cv2.rectangle(event.frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            success, buffer = cv2.imencode('.jpg', event.frame)
+            event.frame = None
+            if not success:
+                raise ValueError("snapshot encoding failed")
+            filename = f"detection_{event.stream_id}_{event.timestamp.strftime('%Y%m%d_%H%M%S_%f')}.jpg"
+            detection = Detection(stream_id=event.stream_id, timestamp=event.timestamp, confidence_score=event.confidence)
+            # Writes the encoded bytes straight to storage; the row is inserted by insert_batch
+            detection.image_path.save(filename, ContentFile(buffer.tobytes()), save=False)
+            detections.append(detection)
+        return detections
+
+    def delete_snapshots(self, detections):
+        for detection in detections:
+            detection.image_path.delete(save=False)
+
+    def insert_batch(self, detections):
+        with transaction.atomic():
+            Detection.objects.bulk_create(detections)
+            Alert.objects.bulk_create([Alert(detection=detection, timestamp=detection.timestamp) for detection in detections])
+            add_to_rollups(detections)
+        return detections
+
+    def get_stats(self):
+        return {
+            'queue_depth': len(self.queue),
+            'batches': self.batches,
+            'rows_written': self.rows_written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'avg_flush_time': round(sum(self.flush_times) / len(self.flush_times) * 1000, 2) if self.flush_times else 0,  # ms
+            'max_flush_time': round(self.max_flush_time * 1000, 2),  # ms
+            'max_queue_wait': round(self.max_queue_wait * 1000, 2),  # ms
+        }
+
+
+detection_writer = DetectionWriter(
+    flush_interval=settings.DETECTION_PERSIST_INTERVAL_MS / 1000,
+    max_batch=settings.DETECTION_PERSIST_BATCH,
+    max_queue=settings.DETECTION_PERSIST_QUEUE,
+)
+
+metrics.registry.gauge(
+    'rtsp_persist_queue_depth', 'Detections waiting to be written', collect=lambda: {(): len(detection_writer.queue)},
+)
@@ -0,0 +1,211 @@
+import asyncio
+import time
+
+import cv2
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.timezone import now
+
+from stream.models import Stream
+from stream.services import metrics
+from stream.services.batching import batch_scheduler
+from stream.services.db_writer import db_writer
+from stream.services.detector import detector_registry
+from stream.services.logs import stream_logger
+from stream.services.monitoring import PerformanceMonitor, global_performance
+from stream.services.motion import MotionGate
+from stream.services.persistence import DetectionEvent, detection_writer
+from stream.services.tracking import FaceTracker
+
+
+class DetectionPipeline:
+    # Per-stream detection state shared by WebSocket viewers and the headless supervisor:
+    # frame sampling, motion gate, detector + tracker, snapshot/alert persistence
+    def __init__(self, stream_id=None, publish=None):
+        self.stream_id = stream_id
+        self.publish = publish or self.discard  # async callable receiving alert messages
+        self.detector = None
+        self.detector_backend = settings.DEFAULT_DETECTOR_BACKEND
+        self.last_alert_time = 0
+        # Alerts fire once per face track; a track first seen during the cooldown alerts when it ends
+        self.alert_cooldown = 2  # seconds
+        self.frame_interval = 1 / 15  # max ~15 FPS detection
+        self.last_frame_processed_time = 0
+        self.tracker = FaceTracker()
+        # Ingest format; detection may run on a smaller copy and map boxes back
+        self.preview_size = (640, 480)
+        self.ingest_fps = None
+        self.detection_width = 0  # 0 = detect at preview resolution
+        self.detection_interval_frames = 1  # run the detector on every Nth sampled frame, track in between
+        self.frames_since_detection = 0
+        self.motion_gate = None  # set from the Stream's motion settings
+        self.detection_enabled = True  # False for viewers of a paused stream in supervisor mode: video only
+        self.performance_monitor = PerformanceMonitor(parent=global_performance)
+        self.log = stream_logger(metrics.stream_label(stream_id))
+        # Viewers without a stream id get their label once they know the camera URL
+        if stream_id:
+            self.set_label(metrics.stream_label(stream_id))
+
+    def set_label(self, label):
+        # Names this pipeline's metric series and logger
+        self.log = stream_logger(label)
+        self.frames_metric = metrics.frames_total.labels(label)
+        self.detect_metric = metrics.stage_seconds.labels(label, 'detect')
+
+    async def discard(self, message):
+        pass
+
+    def configure(self, stream):
+        self.stream_id = stream.id
+        self.set_label(metrics.stream_label(stream.id))
+        self.detector_backend = stream.detector_backend
+        self.detection_interval_frames = max(1, stream.detection_interval_frames)
+        self.preview_size = (stream.preview_width, stream.preview_height)
+        self.ingest_fps = stream.ingest_fps or None
+        self.detection_width = stream.detection_width
+        self.motion_gate = None
+        if stream.motion_gate_enabled:
+            self.motion_gate = MotionGate(
+                sensitivity=stream.motion_sensitivity,
+                min_detection_interval=stream.motion_min_interval,
+            )
+        # Tracks outlive a few detector runs, so one missed detection doesn't re-alert the same face
+        self.tracker.max_age = max(2.0, 3 * self.detection_period())
+
+    def detection_period(self):
+        # Longest expected gap in seconds between detector runs on this stream
+        sample_fps = 1 / self.frame_interval
+        if self.ingest_fps:
+            sample_fps = min(sample_fps, self.ingest_fps)
+        period = self.detection_interval_frames / sample_fps
+        if self.motion_gate is not None:
+            # A still scene is only re-checked every min_detection_interval seconds
+            period = max(period, self.motion_gate.min_detection_interval)
+        return period
+
+    async def load(self):
+        if self.stream_id is not None:
+            try:
+                stream = await sync_to_async(Stream.objects.get)(id=self.stream_id)
+                self.configure(stream)
+            except (Stream.DoesNotExist, ValueError):
+                self.log.warning("⚠️ Unknown stream_id %s, using default settings", self.stream_id)
+                self.stream_id = None  # nothing to attach detections to
+        # First use of a backend loads its model, keep that off the event loop
+        self.detector = await asyncio.to_thread(detector_registry.get, self.detector_backend)
+
+    async def process(self, frame, processing_time):
+        self.frames_metric.inc()
+        now_time = time.time()
+        if not self.detection_enabled:
+            self.performance_monitor.add_frame(processing_time)
+        elif now_time - self.last_frame_processed_time >= self.frame_interval:
+            self.last_frame_processed_time = now_time
+            self.frames_since_detection += 1
+            if self.frames_since_detection >= self.detection_interval_frames and (
+                self.motion_gate is None or self.motion_gate.should_detect(frame)
+            ):
+                self.frames_since_detection = 0
+                detection_start_time = time.time()
+                await self.detect_and_alert(frame)
+                detection_time = time.time() - detection_start_time
+                self.detect_metric.observe(detection_time)
+                self.performance_monitor.add_frame(processing_time, detection_time)
+            else:
+                # Between detector runs, move existing face boxes along
+                tracking_start_time = time.time()
+                self.tracker.predict(tracking_start_time)
+                tracking_time = time.time() - tracking_start_time
+                self.performance_monitor.add_frame(processing_time, tracking_time=tracking_time)
+        else:
+            self.performance_monitor.add_frame(processing_time)
+
+    def get_stats(self):
+        return {
+            'stats': self.performance_monitor.get_stats(),
+            'all_streams': global_performance.get_stats(),
+            'detector': detector_registry.get_stats(),
+            'batching': batch_scheduler.get_stats(),
+            'motion': self.motion_gate.get_stats() if self.motion_gate else None,
+            'active_tracks': len(self.tracker.tracks),
+            'persistence': detection_writer.get_stats(),
+            'database': db_writer.get_stats(),
+        }
+
+    def detection_frame(self, frame):
+        height, width = frame.shape[:2]
+        if not self.detection_width or self.detection_width >= width:
+            return frame, 1.0
+        scale = self.detection_width / width
+        small = cv2.resize(frame, (self.detection_width, int(round(height * scale))), interpolation=cv2.INTER_AREA)
+        return small, scale
+
+    async def detect_and_alert(self, frame):
+        try:
+            # Detect faces in a cross-stream batch (runs off the event loop), on a downscaled copy if configured
+            detection_frame, scale = self.detection_frame(frame)
+            detections = await batch_scheduler.detect(detection_frame, self.detector_backend)
+            if scale != 1.0:
+                detections = [
+                    {**d, 'box': [int(round(v / scale)) for v in d['box']]}
+                    for d in detections
+                ]
+            confident_faces = [d for d in detections if d['confidence'] >= self.detector.confidence_threshold]
+            self.log.debug(
+                "📸 %d face(s) detected, %d above %s", len(detections), len(confident_faces),
+                self.detector.confidence_threshold,
+            )
+
+            now_time = time.time()
+            self.tracker.update(confident_faces, now_time)
+
+            if not confident_faces:
+                self.log.debug("😕 No confident faces detected.")
+                return
+
+            # Faces in view right now that haven't been alerted yet
+            new_tracks = [track for track in self.tracker.tracks if not track.alerted and track.last_seen == now_time]
+            if not new_tracks:
+                self.log.debug("👣 Only already-alerted faces in view.")
+                return
+
+            if now_time - self.last_alert_time < self.alert_cooldown:
+                self.log.debug("⏳ Alert cooldown not finished.")
+                return
+
+            # Pick best new face
+            best_track = max(new_tracks, key=lambda t: t.confidence)
+            x, y, w, h = best_track.detected_box
+            confidence = best_track.confidence
+            self.log.info(
+                "✅ New face track %s with confidence %.2f at [%d, %d, %d, %d]", best_track.track_id, confidence, x, y, w, h,
+            )
+
+            # The others stay pending and get their own alert after the next cooldown
+            self.last_alert_time = now_time
+            best_track.alerted = True
+            if self.stream_id is None:
+                self.log.warning("⚠️ No stream_id, detection not saved.")
+                return
+
+            # Snapshot encoding and the Detection/Alert rows are written in the background;
+            # the frame loop only hands over a private copy of the frame
+            timestamp = now()
+
+            async def announce(detection):
+                self.log.info("🚨 Created alert for detection %s.", detection.id)
+                await self.publish({
+                    'type': 'face_alert',
+                    'track_id': best_track.track_id,
+                    'new_tracks': len(new_tracks),
+                    'timestamp': timestamp.strftime('%Y%m%d_%H%M%S_%f'),
+                    'confidence': confidence,
+                    'snapshot': detection.image_path.url if detection.image_path else ''
+                })
+
+            detection_writer.submit(DetectionEvent(
+                self.stream_id, frame.copy(), (x, y, w, h), confidence, timestamp, on_saved=announce,
+            ))
+
+        except Exception as e:
+            self.log.error("❌ Error in detect_and_alert: %s", e)
@@ -0,0 +1,138 @@
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from stream.models import Detection
+from stream.services.cleanup import delete_detections, remove_files
+
+logger = logging.getLogger(__name__)
+
+
+def stream_policy(stream):
+    # Per-stream limits, falling back to the global defaults when unset (0 = no limit)
+    def pick(value, default):
+        return default if value is None else value
+    return (
+        pick(stream.retention_days, settings.RETENTION_DAYS),
+        pick(stream.retention_max_detections, settings.RETENTION_MAX_DETECTIONS),
+        pick(stream.retention_max_mb, settings.RETENTION_MAX_MB),
+    )
+
+
+def shard_days(root):
+    # detections/<stream>/<YYYY>/<MM>/<DD>/ folders, oldest first, with their size in bytes
+    days = []
+    for year in sorted(entry for entry in os.listdir(root) if entry.isdigit()):
+        for month in sorted(entry for entry in os.listdir(os.path.join(root, year)) if entry.isdigit()):
+            for day in sorted(entry for entry in os.listdir(os.path.join(root, year, month)) if entry.isdigit()):
+                path = os.path.join(root, year, month, day)
+                with os.scandir(path) as entries:
+                    size = sum(entry.stat().st_size for entry in entries if entry.is_file())
+                days.append((f"{year}/{month}/{day}", path, size))
+    return days
+
+
+def remove_empty_dirs(root):
+    # Bottom-up, so a month folder emptied by removing its last day goes too
+    for path, _, _ in os.walk(root, topdown=False):
+        if path != root and not os.listdir(path):
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+
+
+class RetentionPruner:
+    # Deletes in short batches (one transaction each) and pauses in between,
+    # so live detection inserts never wait long for the write lock
+    def __init__(self, batch_size=500, pause=0.05):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.storage = Detection._meta.get_field('image_path').storage
+
+    def prune_stream(self, stream):
+        report = {'stream_id': stream.id, 'detections': 0, 'files': 0, 'bytes': 0}
+        max_days, max_detections, max_mb = stream_policy(stream)
+        detections = Detection.objects.filter(stream=stream)
+
+        if max_days:
+            cutoff = timezone.now() - timedelta(days=max_days)
+            self.prune(report, lambda: detections.filter(timestamp__lt=cutoff).order_by('id').values_list('id', flat=True))
+        if max_detections:
+            self.prune(report, lambda: detections.order_by('-timestamp', '-id').values_list('id', flat=True)[max_detections:])
+        if max_mb:
+            self.prune_by_size(report, stream, detections, max_mb * 1024 * 1024)
+
+        root = self.stream_root(stream)
+        if root and os.path.isdir(root):
+            remove_empty_dirs(root)
+        return report
+
+    def prune(self, report, select_ids):
+        while True:
+            ids = list(select_ids()[:self.batch_size])
+            if not ids:
+                return
+            deleted, names = delete_detections(ids)
+            removed, freed = remove_files(names)
+            report['detections'] += deleted
+            report['files'] += removed
+            report['bytes'] += freed
+            if len(ids) < self.batch_size:
+                return
+            time.sleep(self.pause)
+
+    def prune_by_size(self, report, stream, detections, max_bytes):
+        # Drop whole days, oldest first, until the stream's snapshots fit; today's folder is always kept
+        root = self.stream_root(stream)
+        if root is None:
+            logger.warning("⚠️ Snapshot storage has no local paths, skipping size limit for stream %s", stream.id)
+            return
+        if not os.path.isdir(root):
+            return
+        days = shard_days(root)
+        total = sum(size for _, _, size in days)
+        # Same clock as the upload path, so this is the folder live snapshots are going to
+        today = f"{timezone.now():%Y/%m/%d}"
+        for day, path, size in days:
+            if total <= max_bytes:
+                break
+            if day == today:
+                continue
+            prefix = f"detections/{stream.id}/{day}/"
+            self.prune(report, lambda: detections.filter(image_path__startswith=prefix).order_by('id').values_list('id', flat=True))
+            # Files no row points at any more (failed inserts, manual deletes)
+            leftovers = [f"{prefix}{name}" for name in os.listdir(path)]
+            removed, freed = remove_files(leftovers)
+            report['files'] += removed
+            report['bytes'] += freed
+            total -= size
+
+    def stream_root(self, stream):
+        try:
+            return self.storage.path(f"detections/{stream.id}")
+        except NotImplementedError:
+            return None
+
+    def prune_legacy_snapshots(self, max_days):
+        # media/snapshots/ held a second copy of every snapshot before detections were written once
+        report = {'files': 0, 'bytes': 0}
+        folder = os.path.join(settings.MEDIA_ROOT, 'snapshots')
+        if not max_days or not os.path.isdir(folder):
+            return report
+        cutoff = time.time() - max_days * 86400
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    size = entry.stat().st_size
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        continue
+                    report['files'] += 1
+                    report['bytes'] += size
+        return report
@@ -0,0 +1,84 @@
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min
+from django.db.models.functions import Greatest, Least, TruncHour, TruncMinute
+
+from stream.models import Detection, DetectionRollup
+
+TRUNCATE = {
+    'minute': lambda ts: ts.astimezone(dt_timezone.utc).replace(second=0, microsecond=0),
+    'hour': lambda ts: ts.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0),
+}
+
+
+def add_to_rollups(detections, with_alerts=True):
+    # Fold a batch of saved detections into per-stream minute and hour buckets: one UPDATE
+    # (or INSERT) per touched bucket instead of re-aggregating the Detection table later
+    buckets = {}
+    for detection in detections:
+        for granularity, truncate in TRUNCATE.items():
+            key = (detection.stream_id, granularity, truncate(detection.timestamp))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [1, detection.confidence_score, detection.timestamp, detection.timestamp]
+            else:
+                bucket[0] += 1
+                bucket[1] = max(bucket[1], detection.confidence_score)
+                bucket[2] = min(bucket[2], detection.timestamp)
+                bucket[3] = max(bucket[3], detection.timestamp)
+
+    for (stream_id, granularity, bucket_start), (count, max_confidence, first, last) in buckets.items():
+        alerts = count if with_alerts else 0
+        rollups = DetectionRollup.objects.filter(stream_id=stream_id, granularity=granularity, bucket=bucket_start)
+        changes = {
+            'count': F('count') + count,
+            'alert_count': F('alert_count') + alerts,
+            'max_confidence': Greatest('max_confidence', max_confidence),
+            'first_timestamp': Least('first_timestamp', first),
+            'last_timestamp': Greatest('last_timestamp', last),
+        }
+        if rollups.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                DetectionRollup.objects.create(
+                    stream_id=stream_id, granularity=granularity, bucket=bucket_start,
+                    count=count, alert_count=alerts, max_confidence=max_confidence,
+                    first_timestamp=first, last_timestamp=last,
+                )
+        except IntegrityError:
+            # Another writer created the bucket first
+            rollups.update(**changes)
+
+
+def rebuild_rollups(stream_ids=None):
+    # Recompute every bucket from Detection (all streams, or just stream_ids), e.g. for data saved before rollups existed
+    detections = Detection.objects.all()
+    rollups = DetectionRollup.objects.all()
+    if stream_ids is not None:
+        detections = detections.filter(stream_id__in=stream_ids)
+        rollups = rollups.filter(stream_id__in=stream_ids)
+    rows = 0
+    for granularity, trunc in (('minute', TruncMinute), ('hour', TruncHour)):
+        buckets = (
+            detections
+            .annotate(bucket=trunc('timestamp', tzinfo=dt_timezone.utc))
+            .values('stream_id', 'bucket')
+            .annotate(
+                count=Count('id'),
+                alert_count=Count('alert'),
+                max_confidence=Max('confidence_score'),
+                first_timestamp=Min('timestamp'),
+                last_timestamp=Max('timestamp'),
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            rollups.filter(granularity=granularity).delete()
+            created = DetectionRollup.objects.bulk_create(
+                [DetectionRollup(granularity=granularity, **bucket) for bucket in buckets],
+                batch_size=1000,
+            )
+        rows += len(created)
+    return rows
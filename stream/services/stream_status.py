@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from stream.models import Stream
+from stream.services.db_writer import db_writer
+
+logger = logging.getLogger(__name__)
+
+
+class StreamStatusWriter:
+    # Ingest health flaps during outages; keep only the latest state per camera and
+    # write all of them together every flush_interval seconds (a few UPDATEs, not one per event)
+    def __init__(self, flush_interval=2.0):
+        self.flush_interval = flush_interval
+        self.pending = {}   # rtsp_url -> (state, reported_at)
+        self.written = {}   # rtsp_url -> last state stored in the database
+        self.task = None
+        self.flushes = 0
+        self.rows_updated = 0
+        self.coalesced = 0
+
+    def report(self, rtsp_url, state):
+        if rtsp_url in self.pending:
+            self.coalesced += 1
+        self.pending[rtsp_url] = (state, timezone.now())
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        while self.pending:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        changes = {url: change for url, change in pending.items() if self.written.get(url) != change[0]}
+        if not changes:
+            return
+        try:
+            await db_writer.run_job(self.write, changes)
+        except Exception as e:
+            logger.error("❌ Failed to update stream status: %s", e)
+            # Retry on the next flush unless a newer state arrived meanwhile
+            for url, change in changes.items():
+                self.pending.setdefault(url, change)
+            return
+        for url, (state, _) in changes.items():
+            self.written[url] = state
+
+    def write(self, changes):
+        by_state = defaultdict(list)
+        for url, (state, _) in changes.items():
+            by_state[state].append(url)
+        with transaction.atomic():
+            for state, urls in by_state.items():
+                fields = {'status': state}
+                if state == 'live':
+                    fields['last_connected'] = max(changes[url][1] for url in urls)
+                self.rows_updated += Stream.objects.filter(rtsp_url__in=urls).update(**fields)
+        self.flushes += 1
+
+    def get_stats(self):
+        return {
+            'pending': len(self.pending),
+            'flushes': self.flushes,
+            'rows_updated': self.rows_updated,
+            'coalesced': self.coalesced,
+        }
+
+
+stream_status_writer = StreamStatusWriter(flush_interval=settings.STREAM_STATUS_FLUSH_INTERVAL)
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import time
+
+import cv2
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from stream.models import Stream
+from stream.services import metrics
+from stream.services.camera_hub import camera_hub
+from stream.services.control import SUPERVISOR_GROUP, stream_group
+from stream.services.leases import default_node_id, get_lease_store, stream_lease_key
+from stream.services.logs import set_stream_log_level
+from stream.services.pipeline import DetectionPipeline
+
+# Fields whose change means a running pipeline must be rebuilt
+CONFIG_FIELDS = (
+    'rtsp_url', 'detector_backend', 'detection_interval_frames', 'ingest_fps',
+    'preview_width', 'preview_height', 'detection_width',
+    'motion_gate_enabled', 'motion_sensitivity', 'motion_min_interval',
+)
+
+logger = logging.getLogger(__name__)
+
+
+def config_signature(stream):
+    return tuple(getattr(stream, field) for field in CONFIG_FIELDS)
+
+
+class StreamWorker:
+    # One headless pipeline: shared ingest -> detection -> frames/alerts/stats to the stream's group
+    def __init__(self, stream, channel_layer, node_id=None, publish_width=0, jpeg_quality=75, stats_interval=5):
+        self.stream = stream
+        self.node_id = node_id
+        self.publish_width = publish_width
+        self.signature = config_signature(stream)
+        self.channel_layer = channel_layer
+        self.group_name = stream_group(stream.id)
+        self.jpeg_quality = jpeg_quality
+        self.stats_interval = stats_interval
+        self.pipeline = DetectionPipeline(stream.id, publish=self.publish)
+        self.pipeline.configure(stream)
+        label = metrics.stream_label(stream.id)
+        self.encode_metric = metrics.stage_seconds.labels(label, 'encode')
+        self.send_metric = metrics.stage_seconds.labels(label, 'send')
+        self.task = None
+        self.stopped_at = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def publish(self, message):
+        await self.channel_layer.group_send(self.group_name, {'type': 'stream.message', 'message': message})
+
+    async def run(self):
+        subscription = None
+        try:
+            await self.pipeline.load()
+            width, height = self.pipeline.preview_size
+            subscription = await camera_hub.subscribe(
+                self.stream.rtsp_url, width, height, self.pipeline.ingest_fps, stream_id=self.stream.id,
+            )
+            self.pipeline.log.info("🛰️ Detection pipeline started for stream %s (%s)", self.stream.id, self.stream.name)
+            last_stats_time = time.time()
+            while True:
+                frame_start_time = time.time()
+                frame = await subscription.get()
+                if frame is None:
+                    self.pipeline.log.info("🚫 Camera feed ended for stream %s", self.stream.id)
+                    break
+
+                now_time = time.time()
+                await self.pipeline.process(frame, now_time - frame_start_time)
+
+                encode_start_time = time.perf_counter()
+                published = self.publish_frame(frame)
+                success, buffer = cv2.imencode('.jpg', published, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                self.encode_metric.observe(time.perf_counter() - encode_start_time)
+                if success:
+                    send_start_time = time.perf_counter()
+                    # Width and quality let each viewer decide whether it has to re-encode for its client
+                    await self.channel_layer.group_send(self.group_name, {
+                        'type': 'stream.frame',
+                        'frame': buffer.tobytes(),
+                        'width': published.shape[1],
+                        'quality': self.jpeg_quality,
+                    })
+                    self.send_metric.observe(time.perf_counter() - send_start_time)
+
+                if now_time - last_stats_time >= self.stats_interval:
+                    last_stats_time = now_time
+                    await self.publish({
+                        'type': 'performance_stats',
+                        'node': self.node_id,
+                        **self.pipeline.get_stats(),
+                        'ingest': subscription.source.get_health(),
+                    })
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.pipeline.log.error("🔥 Detection pipeline error for stream %s: %s", self.stream.id, e)
+        finally:
+            self.stopped_at = time.time()
+            if subscription:
+                await camera_hub.unsubscribe(subscription)
+
+    def publish_frame(self, frame):
+        # Frames cross the channel layer to every node with viewers, so optionally send them smaller
+        height, width = frame.shape[:2]
+        if not self.publish_width or width <= self.publish_width:
+            return frame
+        scale = self.publish_width / width
+        return cv2.resize(frame, (self.publish_width, int(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+class DetectionSupervisor:
+    # Keeps one StreamWorker per Stream with detection_enabled, independent of connected viewers.
+    # With several nodes, a stream runs only on the node holding its lease.
+    def __init__(self, reconcile_interval=30, restart_delay=5, node_id=None, lease_ttl=None, leases=None, publish_width=None):
+        self.reconcile_interval = reconcile_interval
+        self.restart_delay = restart_delay
+        self.node_id = node_id or settings.DETECTION_NODE_ID or default_node_id()
+        self.lease_ttl = lease_ttl or settings.DETECTION_LEASE_TTL
+        self.leases = leases or get_lease_store()
+        self.publish_width = settings.DETECTION_PUBLISH_WIDTH if publish_width is None else publish_width
+        self.workers = {}
+        self.enabled = {}
+        self.channel_layer = get_channel_layer()
+        self.lock = asyncio.Lock()
+
+    async def run(self):
+        channel_name = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(SUPERVISOR_GROUP, channel_name)
+        logger.info("🛰️ Detection supervisor running on node %s", self.node_id)
+        listener = asyncio.create_task(self.listen(channel_name))
+        lease_keeper = asyncio.create_task(self.keep_leases())
+        try:
+            while True:
+                await self.reconcile()
+                await asyncio.sleep(self.reconcile_interval)
+        finally:
+            listener.cancel()
+            lease_keeper.cancel()
+            await self.channel_layer.group_discard(SUPERVISOR_GROUP, channel_name)
+            for stream_id in list(self.workers):
+                await self.stop_worker(stream_id)
+
+    async def listen(self, channel_name):
+        # Control messages from the REST views: created / updated / paused / resumed / deleted
+        while True:
+            try:
+                message = await self.channel_layer.receive(channel_name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Control channel error, retrying: %s", e)
+                await asyncio.sleep(self.restart_delay)
+                continue
+            if message.get('type') == 'stream.log_level':
+                set_stream_log_level(message['stream_id'], message['level'])
+                continue
+            if message.get('type') != 'stream.control':
+                continue
+            logger.info("🎛️ Stream %s %s", message['stream_id'], message['action'])
+            try:
+                await self.reconcile_stream(message['stream_id'])
+            except Exception as e:
+                logger.error("❌ Failed to apply control message %s: %s", message, e)
+
+    async def keep_leases(self):
+        # Renew what we own well inside the TTL, and claim cameras whose owner stopped renewing
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                async with self.lock:
+                    for stream_id in list(self.workers):
+                        if not await self.leases.renew(stream_lease_key(stream_id), self.node_id, self.lease_ttl):
+                            logger.warning("⚠️ Lost lease for stream %s, another node owns it now", stream_id)
+                            await self.stop_worker(stream_id, release=False)
+                    for stream in list(self.enabled.values()):
+                        await self.ensure_worker(stream)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Lease maintenance failed, retrying: %s", e)
+
+    async def reconcile(self):
+        streams = await sync_to_async(list)(Stream.objects.filter(detection_enabled=True))
+        async with self.lock:
+            self.enabled = {stream.id: stream for stream in streams}
+            for stream_id in set(self.workers) - set(self.enabled):
+                await self.stop_worker(stream_id)
+            for stream in streams:
+                await self.ensure_worker(stream)
+
+    async def reconcile_stream(self, stream_id):
+        stream = await sync_to_async(Stream.objects.filter(id=stream_id).first)()
+        async with self.lock:
+            if stream is None or not stream.detection_enabled:
+                self.enabled.pop(stream_id, None)
+                await self.stop_worker(stream_id)
+            else:
+                self.enabled[stream.id] = stream
+                await self.ensure_worker(stream)
+
+    async def ensure_worker(self, stream):
+        worker = self.workers.get(stream.id)
+        if worker and worker.signature == config_signature(stream):
+            if not worker.task.done():
+                return
+            # Feed ended or the pipeline failed: restart, but not in a tight loop
+            if time.time() - (worker.stopped_at or 0) < self.restart_delay:
+                return
+        if worker:
+            # Restarting on this node, so keep the lease
+            await self.stop_worker(stream.id, release=False)
+        elif not await self.leases.acquire(stream_lease_key(stream.id), self.node_id, self.lease_ttl):
+            return  # Owned by another node
+        worker = self.workers[stream.id] = StreamWorker(
+            stream, self.channel_layer, node_id=self.node_id, publish_width=self.publish_width,
+        )
+        worker.start()
+
+    async def stop_worker(self, stream_id, release=True):
+        worker = self.workers.pop(stream_id, None)
+        if worker:
+            await worker.stop()
+            logger.info("🛑 Detection pipeline stopped for stream %s", stream_id)
+            if release:
+                # Hand the camera over right away instead of waiting for the lease to expire
+                await self.leases.release(stream_lease_key(stream_id), self.node_id)
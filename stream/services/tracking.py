@@ -0,0 +1,90 @@
+import itertools
+import time
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = ix * iy
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union else 0
+
+
+class Track:
+    def __init__(self, track_id, box, confidence, timestamp):
+        self.track_id = track_id
+        self.detected_box = list(box)
+        self.box = list(box)
+        self.confidence = confidence
+        self.velocity = (0.0, 0.0)  # px/s of the top-left corner
+        self.last_seen = timestamp
+        self.alerted = False
+
+    def update(self, box, confidence, timestamp):
+        dt = timestamp - self.last_seen
+        if dt > 0:
+            self.velocity = ((box[0] - self.detected_box[0]) / dt, (box[1] - self.detected_box[1]) / dt)
+        self.detected_box = list(box)
+        self.box = list(box)
+        self.confidence = confidence
+        self.last_seen = timestamp
+
+    def predict(self, timestamp):
+        dt = timestamp - self.last_seen
+        x, y, w, h = self.detected_box
+        self.box = [x + self.velocity[0] * dt, y + self.velocity[1] * dt, w, h]
+
+
+class FaceTracker:
+    # Greedy IoU association between detector runs, constant-velocity propagation in between
+    def __init__(self, iou_threshold=0.3, max_age=2.0):
+        self.iou_threshold = iou_threshold
+        # Seconds a track may go undetected before it is dropped. Must span a few detector runs
+        # (the pipeline sets it from the stream's detection period), so a face the detector misses
+        # once is matched again at its predicted box instead of starting a new, alerting track
+        self.max_age = max_age
+        self.tracks = []
+        self.track_ids = itertools.count(1)
+
+    def update(self, detections, timestamp=None):
+        # detections: [{'box': [x, y, w, h], 'confidence': c}, ...]; returns the tracks created by this call
+        timestamp = timestamp or time.time()
+        for track in self.tracks:
+            track.predict(timestamp)
+
+        pairs = sorted(
+            (
+                (iou(track.box, detection['box']), t, d)
+                for t, track in enumerate(self.tracks)
+                for d, detection in enumerate(detections)
+            ),
+            reverse=True,
+        )
+        matched_tracks = set()
+        matched_detections = set()
+        for score, t, d in pairs:
+            if score < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_detections:
+                continue
+            self.tracks[t].update(detections[d]['box'], detections[d]['confidence'], timestamp)
+            matched_tracks.add(t)
+            matched_detections.add(d)
+
+        self.tracks = [track for track in self.tracks if timestamp - track.last_seen <= self.max_age]
+
+        new_tracks = [
+            Track(next(self.track_ids), detection['box'], detection['confidence'], timestamp)
+            for d, detection in enumerate(detections)
+            if d not in matched_detections
+        ]
+        self.tracks.extend(new_tracks)
+        return new_tracks
+
+    def predict(self, timestamp=None):
+        timestamp = timestamp or time.time()
+        for track in self.tracks:
+            track.predict(timestamp)
+        return self.tracks
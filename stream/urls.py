@@ -1,8 +1,10 @@
 from django.urls import path, include
 from stream.views.auth import AdminLoginView, AdminRegisterView
-from stream.views.stream import list_streams, create_stream, update_stream_status, delete_stream, get_stream
-from stream.views.alert import list_alerts,  get_alert, update_alert, delete_alert
+from stream.views.stream import list_streams, create_stream, update_stream_status, delete_stream, get_stream, update_stream_log_level
+from stream.views.alert import list_alerts,  get_alert, update_alert, delete_alert, bulk_update_alerts, bulk_delete_alerts
 from stream.views.detection import create_detection, list_detections, get_detection, update_detection, delete_detection
+from stream.views.export import export_alerts, export_detections
+from stream.views.stats import detection_stats
 
 urlpatterns = [
     #auth
@@ -14,15 +16,22 @@ urlpatterns = [
     path('streams/<int:stream_id>/', get_stream, name='get_stream'),
     path('streams/<int:stream_id>/status/', update_stream_status, name='update_stream_status'),
     path('streams/<int:stream_id>/delete/', delete_stream, name='delete_stream'),
+    path('streams/<int:stream_id>/log-level/', update_stream_log_level, name='update_stream_log_level'),  # PATCH
     #alerts
     path("alerts/", list_alerts, name="list_alerts"),
+    path("alerts/export/", export_alerts, name="export_alerts"),  # GET ?format=ndjson|csv|zip
     path("alerts/<int:alert_id>/", get_alert, name="get_alert"),
     path("alerts/<int:alert_id>/update/", update_alert, name="update_alert"),
     path("alerts/<int:alert_id>/delete/", delete_alert, name="delete_alert"),
+    path("alerts/bulk/update/", bulk_update_alerts, name="bulk_update_alerts"),  # POST
+    path("alerts/bulk/delete/", bulk_delete_alerts, name="bulk_delete_alerts"),  # POST
     #detections
     path('detections/create', create_detection, name='create_detection'),  # POST
     path('detections/', list_detections, name='list_detections'),    # GET
+    path('detections/export/', export_detections, name='export_detections'),  # GET ?format=ndjson|csv|zip
     path('detections/<int:detection_id>/', get_detection, name='get_detection'),  # GET
     path('detections/<int:detection_id>/', update_detection, name='update_detection'),  # PUT, PATCH
     path('detections/<int:detection_id>/', delete_detection, name='delete_detection'),  # DELETE
+    #stats
+    path('stats/', detection_stats, name='detection_stats'),  # GET ?granularity=minute|hour&stream=&since=&until=
 ]
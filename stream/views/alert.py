@@ -3,6 +3,13 @@ from stream.models import Alert, Detection
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
+from stream.services.cleanup import delete_detections, remove_files_later
+from stream.services.pagination import InvalidQuery, filter_by_time, paginate, parse_bool, parse_number, parse_time
+
+ALERT_FIELDS = (
+    "id", "detection_id", "detection__stream_id", "detection__confidence_score",
+    "detection__image_path", "timestamp", "viewed",
+)
 
 def parse_json(request):
     try:
@@ -11,24 +18,35 @@ def parse_json(request):
         return None
 
 
-# 📌 1. List Alerts
+# 📌 1. List Alerts (newest first, cursor-paginated)
 @require_http_methods(["GET"])
 def list_alerts(request):
-    alerts = Alert.objects.select_related("detection", "detection__stream").all().order_by('-timestamp')
-    alert_list = []
+    params = request.GET
+    alerts = Alert.objects.all()
+    try:
+        if params.get("stream"):
+            alerts = alerts.filter(detection__stream_id=parse_number(params["stream"], "stream", int))
+        if params.get("viewed"):
+            alerts = alerts.filter(viewed=parse_bool(params["viewed"], "viewed"))
+        if params.get("min_confidence"):
+            alerts = alerts.filter(detection__confidence_score__gte=parse_number(params["min_confidence"], "min_confidence"))
+        alerts = filter_by_time(alerts, params)
+        rows, next_cursor = paginate(alerts, params, ALERT_FIELDS)
+    except InvalidQuery as e:
+        return JsonResponse({"error": str(e)}, status=400)
 
-    for alert in alerts:
-        alert_list.append({
-            "id": alert.id,
-            "detection_id": alert.detection.id,
-            "stream_id": alert.detection.stream.id,
-            "confidence_score": alert.detection.confidence_score,
-            "image_url": alert.detection.image_path.url if alert.detection.image_path else None,
-            "timestamp": alert.timestamp,
-            "viewed": alert.viewed
-        })
+    storage = Detection._meta.get_field("image_path").storage
+    alert_list = [{
+        "id": row["id"],
+        "detection_id": row["detection_id"],
+        "stream_id": row["detection__stream_id"],
+        "confidence_score": row["detection__confidence_score"],
+        "image_url": storage.url(row["detection__image_path"]) if row["detection__image_path"] else None,
+        "timestamp": row["timestamp"],
+        "viewed": row["viewed"]
+    } for row in rows]
 
-    return JsonResponse({"alerts": alert_list})
+    return JsonResponse({"alerts": alert_list, "next_cursor": next_cursor})
 
 
 # 📌 2. Get Alert by ID
@@ -77,3 +95,77 @@ def delete_alert(request, alert_id):
         return JsonResponse({"message": "Alert deleted"})
     except Alert.DoesNotExist:
         return JsonResponse({"error": "Alert not found"}, status=404)
+
+
+def json_bool(data, name):
+    # JSON true/false only: bool("false") would be True
+    value = data[name]
+    if not isinstance(value, bool):
+        raise InvalidQuery(f"{name} must be true or false")
+    return value
+
+
+def select_alerts(data, viewed_filter=True):
+    # Bulk selectors: explicit ids and/or a filter (stream, before, all_unviewed, viewed); at least one is required
+    alerts = Alert.objects.all()
+    selected = False
+    if "ids" in data:
+        ids = data["ids"]
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise InvalidQuery("ids must be a list of integers")
+        alerts = alerts.filter(id__in=ids)
+        selected = True
+    if data.get("stream") is not None:
+        alerts = alerts.filter(detection__stream_id=parse_number(str(data["stream"]), "stream", int))
+        selected = True
+    if data.get("before") is not None:
+        if not isinstance(data["before"], str):
+            raise InvalidQuery("Invalid before: expected an ISO 8601 datetime")
+        alerts = alerts.filter(timestamp__lt=parse_time(data["before"], "before"))
+        selected = True
+    if data.get("all_unviewed"):
+        alerts = alerts.filter(viewed=False)
+        selected = True
+    elif viewed_filter and data.get("viewed") is not None:
+        alerts = alerts.filter(viewed=json_bool(data, "viewed"))
+        selected = True
+    if not selected:
+        raise InvalidQuery("Provide ids or a filter (stream, before, all_unviewed)")
+    return alerts
+
+
+# 📌 5. Bulk update alerts (mark viewed/unviewed) with one UPDATE
+@csrf_exempt
+@require_http_methods(["POST"])
+def bulk_update_alerts(request):
+    data = parse_json(request)
+    if not isinstance(data, dict):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    try:
+        # Here "viewed" is the value to set, not a filter
+        alerts = select_alerts(data, viewed_filter=False)
+        viewed = json_bool(data, "viewed") if "viewed" in data else True
+    except InvalidQuery as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Rows already in the target state are left alone
+    updated = alerts.exclude(viewed=viewed).update(viewed=viewed)
+    return JsonResponse({"message": "Alerts updated", "updated": updated, "viewed": viewed})
+
+
+# 📌 6. Bulk delete alerts, with their detections and snapshot files
+@csrf_exempt
+@require_http_methods(["POST"])
+def bulk_delete_alerts(request):
+    data = parse_json(request)
+    if not isinstance(data, dict):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    try:
+        alerts = select_alerts(data)
+    except InvalidQuery as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    detection_ids = list(alerts.values_list("detection_id", flat=True))
+    deleted, snapshots = delete_detections(detection_ids)
+    files = remove_files_later(snapshots)
+    return JsonResponse({"message": "Alerts deleted", "deleted": deleted, "files_scheduled": files})
@@ -1,8 +1,13 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.db import transaction
 from stream.models import Detection, Stream
 import json
+from stream.services.rollups import add_to_rollups
+from stream.services.pagination import InvalidQuery, filter_by_time, paginate, parse_number
+
+DETECTION_FIELDS = ('id', 'stream_id', 'stream__name', 'confidence_score', 'image_path', 'timestamp')
 
 def parse_json(request):
     try:
@@ -24,10 +29,12 @@ def create_detection(request):
 
     try:
         stream = Stream.objects.get(id=data['stream_id'])
-        detection = Detection.objects.create(
-            stream=stream,
-            confidence_score=data['confidence_score']
-        )
+        with transaction.atomic():
+            detection = Detection.objects.create(
+                stream=stream,
+                confidence_score=data['confidence_score']
+            )
+            add_to_rollups([detection], with_alerts=False)
         return JsonResponse({
             'id': detection.id,
             'message': 'Detection created'
@@ -40,17 +47,29 @@ def create_detection(request):
 
 @require_http_methods(["GET"])
 def list_detections(request):
+    params = request.GET
     detections = Detection.objects.all()
-    result = []
-    for d in detections:
-        result.append({
-            'id': d.id,
-            'stream': d.stream.name,
-            'confidence': d.confidence_score,
-            'timestamp': d.timestamp.isoformat(),
-        })
-
-    return JsonResponse({'detections': result})
+    try:
+        if params.get('stream'):
+            detections = detections.filter(stream_id=parse_number(params['stream'], 'stream', int))
+        if params.get('min_confidence'):
+            detections = detections.filter(confidence_score__gte=parse_number(params['min_confidence'], 'min_confidence'))
+        detections = filter_by_time(detections, params)
+        rows, next_cursor = paginate(detections, params, DETECTION_FIELDS)
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    storage = Detection._meta.get_field('image_path').storage
+    result = [{
+        'id': row['id'],
+        'stream_id': row['stream_id'],
+        'stream': row['stream__name'],
+        'confidence': row['confidence_score'],
+        'image_url': storage.url(row['image_path']) if row['image_path'] else None,
+        'timestamp': row['timestamp'].isoformat(),
+    } for row in rows]
+
+    return JsonResponse({'detections': result, 'next_cursor': next_cursor})
 
 
 @require_http_methods(["GET"])
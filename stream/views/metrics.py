@@ -0,0 +1,10 @@
+from django.http import HttpResponse
+from django.views.decorators.http import require_http_methods
+
+from stream.services.metrics import registry
+
+
+# 📈 Prometheus scrape target. Async, so it renders on the event loop that updates the metrics
+@require_http_methods(["GET"])
+async def metrics_view(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
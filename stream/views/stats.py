@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.db.models import Count, Sum
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+
+from stream.models import Alert, DetectionRollup
+from stream.services.pagination import InvalidQuery, parse_number, parse_time
+from stream.services.rollups import TRUNCATE
+
+# Longest range one request may chart at each granularity
+MAX_RANGE = {
+    'minute': timedelta(days=7),
+    'hour': timedelta(days=366),
+}
+ROLLUP_FIELDS = (
+    'stream_id', 'bucket', 'count', 'alert_count', 'max_confidence', 'first_timestamp', 'last_timestamp',
+)
+
+
+# 📊 Detections per stream per minute/hour, read from the rollup table
+@require_http_methods(["GET"])
+def detection_stats(request):
+    params = request.GET
+    granularity = params.get('granularity', 'hour')
+    if granularity not in MAX_RANGE:
+        return JsonResponse({'error': f"Invalid granularity: {granularity}"}, status=400)
+
+    now_time = timezone.now()
+    try:
+        until = parse_time(params['until'], 'until') if params.get('until') else now_time
+        since = parse_time(params['since'], 'since') if params.get('since') else until - timedelta(hours=24)
+        stream_id = parse_number(params['stream'], 'stream', int) if params.get('stream') else None
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if until - since > MAX_RANGE[granularity]:
+        return JsonResponse({'error': f"Range too long for {granularity} buckets"}, status=400)
+
+    rollups = DetectionRollup.objects.filter(granularity=granularity, bucket__gte=since, bucket__lt=until)
+    # alerts_24h: whole hours from the rollups, plus the partial hour at the start from the Alert table
+    cutoff = now_time - timedelta(hours=24)
+    first_hour = TRUNCATE['hour'](cutoff)
+    if first_hour < cutoff:
+        first_hour += timedelta(hours=1)
+    recent = DetectionRollup.objects.filter(granularity='hour', bucket__gte=first_hour)
+    edge = Alert.objects.filter(timestamp__gte=cutoff, timestamp__lt=first_hour)
+    if stream_id is not None:
+        rollups = rollups.filter(stream_id=stream_id)
+        recent = recent.filter(stream_id=stream_id)
+        edge = edge.filter(detection__stream_id=stream_id)
+
+    buckets = list(rollups.order_by('bucket', 'stream_id').values(*ROLLUP_FIELDS))
+    totals = {}
+    for bucket in buckets:
+        total = totals.setdefault(bucket['stream_id'], {'count': 0, 'alert_count': 0, 'max_confidence': 0})
+        total['count'] += bucket['count']
+        total['alert_count'] += bucket['alert_count']
+        total['max_confidence'] = max(total['max_confidence'], bucket['max_confidence'])
+
+    alerts_24h = {
+        row['stream_id']: row['alerts']
+        for row in recent.values('stream_id').annotate(alerts=Sum('alert_count')).order_by()
+    }
+    for row in edge.values('detection__stream_id').annotate(alerts=Count('id')).order_by():
+        stream = row['detection__stream_id']
+        alerts_24h[stream] = alerts_24h.get(stream, 0) + row['alerts']
+
+    return JsonResponse({
+        'granularity': granularity,
+        'since': since,
+        'until': until,
+        'buckets': buckets,
+        'totals': totals,
+        'alerts_24h': alerts_24h,
+    })
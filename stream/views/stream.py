@@ -1,9 +1,32 @@
 from django.http import JsonResponse, HttpResponseNotAllowed, HttpResponseBadRequest
-from stream.models import Stream
+from stream.models import DETECTOR_BACKEND_CHOICES, Stream
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
+import math
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from stream.services.stream_init import generate_ws_url
+from stream.services.catalogue import stream_catalogue
+from stream.services.control import broadcast_log_level, notify_supervisor
+from stream.services.logs import set_stream_log_level
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Numeric stream settings: type, default, minimum, maximum (None = unbounded); a null default may also be sent as null
+STREAM_SETTINGS = {
+    'confidence_threshold': (float, 0.8, 0, 1),
+    'ingest_fps': (float, 15, 0, None),  # 0 = camera rate
+    'preview_width': (int, 640, 16, None),
+    'preview_height': (int, 480, 16, None),
+    'detection_width': (int, 320, 0, None),  # 0 = preview size
+    'detection_interval_frames': (int, 1, 1, None),
+    'motion_sensitivity': (float, 0.02, 0, 1),
+    'motion_min_interval': (float, 5.0, 0, None),
+    'retention_days': (int, None, 0, None),
+    'retention_max_detections': (int, None, 0, None),
+    'retention_max_mb': (int, None, 0, None),
+}
 
 def parse_json(request):
     try:
@@ -11,6 +34,28 @@ def parse_json(request):
     except json.JSONDecodeError:
         return None
 
+
+def clean_settings(data):
+    # JSON numbers only, in range, so a bad value is a 400 here rather than a 500 on save or a broken pipeline
+    cleaned = {}
+    for field, (kind, default, minimum, maximum) in STREAM_SETTINGS.items():
+        value = data.get(field, default)
+        if value is None and default is None:
+            cleaned[field] = None
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f'{field} must be a number')
+        if kind is int and value != int(value):
+            raise ValueError(f'{field} must be a whole number')
+        if value < minimum or (maximum is not None and value > maximum):
+            limit = f'between {minimum} and {maximum}' if maximum is not None else f'at least {minimum}'
+            raise ValueError(f'{field} must be {limit}')
+        cleaned[field] = kind(value)
+    cleaned['motion_gate_enabled'] = data.get('motion_gate_enabled', False)
+    if not isinstance(cleaned['motion_gate_enabled'], bool):
+        raise ValueError('motion_gate_enabled must be true or false')
+    return cleaned
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def create_stream(request):
@@ -23,14 +68,25 @@ def create_stream(request):
         if field not in data:
             return JsonResponse({'error': f'Missing required field: {field}'}, status=400)
 
+    if data.get('detector_backend', 'mtcnn') not in dict(DETECTOR_BACKEND_CHOICES):
+        return JsonResponse({'error': f"Unknown detector backend: {data['detector_backend']}"}, status=400)
+
+    try:
+        stream_settings = clean_settings(data)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
     try:
         stream = Stream.objects.create(
             name=data['name'],
             description=data.get('description', ''),
             rtsp_url=data['rtsp_url'],
-            confidence_threshold=data.get('confidence_threshold', 0.8),
+            detector_backend=data.get('detector_backend', 'mtcnn'),
+            **stream_settings,
             detection_enabled=True
         )
+        stream_catalogue.invalidate()
+        notify_supervisor(stream.id, 'created')
         ws_url = generate_ws_url(stream.rtsp_url)
         return JsonResponse({
             'id': stream.id,
@@ -41,41 +97,34 @@ def create_stream(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def catalogue_response(request, payload, etag, last_modified):
+    # 304 when the client's copy is still current; no-cache makes browsers ask every time
+    last_modified = int(last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(payload)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 @require_http_methods(["GET"])
 def list_streams(request):
-    all_streams = Stream.objects.all()
-    streams = []
-
-    for stream in all_streams:
-        streams.append({
-            "id": stream.id,
-            "name": stream.name,
-            "description": stream.description,
-            "rtsp_url": stream.rtsp_url,
-            "confidence_threshold": stream.confidence_threshold,
-            "detection_enabled": stream.detection_enabled,
-            "ws_url": generate_ws_url(stream.rtsp_url)
-        })
-
-    return JsonResponse({'streams': streams})
+    streams, etag, last_modified = stream_catalogue.snapshot()
+    return catalogue_response(request, {'streams': streams}, etag, last_modified)
 
 
 @require_http_methods(["GET"])
 def get_stream(request, stream_id):
-    try:
-        stream = Stream.objects.get(id=stream_id)
-        stream_data = {
-            "id": stream.id,
-            "name": stream.name,
-            "description": stream.description,
-            "rtsp_url": stream.rtsp_url,
-            "confidence_threshold": stream.confidence_threshold,
-            "detection_enabled": stream.detection_enabled,
-            "ws_url": generate_ws_url(stream.rtsp_url)
-        }
-        return JsonResponse({'stream': stream_data})
-    except Stream.DoesNotExist:
+    streams, etag, last_modified = stream_catalogue.snapshot(stream_id)
+    if not streams and Stream.objects.filter(id=stream_id).exists():
+        # Created by another process since the catalogue was built
+        stream_catalogue.invalidate()
+        streams, etag, last_modified = stream_catalogue.snapshot(stream_id)
+    if not streams:
         return JsonResponse({'error': 'Stream not found'}, status=404)
+    return catalogue_response(request, {'stream': streams[0]}, etag, last_modified)
 
 
 @csrf_exempt
@@ -103,6 +152,8 @@ def update_stream_status(request, stream_id):
         return JsonResponse({'error': 'Invalid action'}, status=400)
 
     stream.save()
+    stream_catalogue.invalidate()
+    notify_supervisor(stream.id, action)
     return JsonResponse({'message': f'Stream {action}d', 'status': stream.detection_enabled})
 
 
@@ -112,6 +163,31 @@ def delete_stream(request, stream_id):
     try:
         stream = Stream.objects.get(id=stream_id)
         stream.delete()
+        stream_catalogue.invalidate()
+        notify_supervisor(stream_id, 'deleted')
         return JsonResponse({'message': 'Stream deleted'})
     except Stream.DoesNotExist:
         return JsonResponse({'error': 'Stream not found'}, status=404)
+
+
+@csrf_exempt
+@require_http_methods(["PATCH"])
+def update_stream_log_level(request, stream_id):
+    # {"level": "DEBUG"} turns on one stream's per-frame logging without a restart; null resets it
+    data = parse_json(request)
+    if data is None or 'level' not in data:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    level = data['level']
+    if level is not None:
+        level = str(level).upper()
+        if level not in LOG_LEVELS:
+            return JsonResponse({'error': f"level must be one of {', '.join(LOG_LEVELS)} or null"}, status=400)
+
+    if not Stream.objects.filter(id=stream_id).exists():
+        return JsonResponse({'error': 'Stream not found'}, status=404)
+
+    # Viewers in this process, then every detection supervisor
+    set_stream_log_level(stream_id, level)
+    broadcast_log_level(stream_id, level)
+    return JsonResponse({'message': 'Log level updated', 'level': level})